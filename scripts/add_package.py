@@ -5,16 +5,15 @@ import argparse
 import re
 import subprocess
 from pathlib import Path
+from string import Template
 
 # Add scripts directory to path to import yocto_utils
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = Path(__file__).resolve().parent
+sys.path.append(str(SCRIPTS_DIR))
 from yocto_utils import (
     UI,
-    run_command,
-    get_bitbake_yocto_dir,
     find_custom_layer,
     get_all_custom_layers,
-    set_cached_layer,
     get_cached_layer,
     get_cached_image,
     find_image_recipes,
@@ -29,22 +28,294 @@ except ImportError:
     def detect_dependencies(project_dir, workspace_root, layer_dir):
         return []
 
-def detect_rust_dependencies(project_dir):
-    # Placeholder
-    return []
+WORKSPACE_ROOT = SCRIPTS_DIR.parent
+
+ACTION_REQUIRED = f"\n  {UI.BOLD}Action Required:{UI.NC}"
+
+# Marker files used to auto-detect the project type, in priority order
+PROJECT_MARKERS = (
+    (frozenset({"CMakeLists.txt"}), "cpp"),
+    (frozenset({"Cargo.toml"}), "rust"),
+    (frozenset({"go.mod"}), "go"),
+    (frozenset({"setup.py", "pyproject.toml"}), "python"),
+    (frozenset({"configure.ac", "Makefile.am"}), "autotools"),
+    (frozenset({"Makefile"}), "makefile"),
+)
+
+# BitBake class inherited by each project type's recipe
+INHERIT_CLASSES = {
+    "cpp": "inherit cmake",
+    "cmake": "inherit cmake",
+    "autotools": "inherit autotools",
+    "module": "inherit module",
+    "rust": "inherit cargo",
+    "go": "inherit go",
+    "python": "inherit setuptools3",
+}
+
+# Recipe templates, parsed once at import. BitBake/shell '$' must be written as '$$'.
+CMAKE_RECIPE = Template("""SUMMARY = "$project_name application"
+$license_text
+
+$inherit_class
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+EXTERNALSRC_BUILD = "$${WORKDIR}/build"
+
+$depends_str
+""")
 
-def detect_go_dependencies(project_dir):
-    # Placeholder
+MODULE_RECIPE = Template("""SUMMARY = "$project_name kernel module"
+$license_text
+$pn_override
+
+$inherit_class
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+EXTERNALSRC_BUILD = "$${WORKDIR}/build"
+
+# Set up build directory with symlinks to source files
+do_configure:prepend() {
+    # Create build directory
+    mkdir -p $${EXTERNALSRC_BUILD}
+    
+    # Symlink source files to build directory
+    for file in $${EXTERNALSRC}/*; do
+        filename=$$(basename "$$file")
+        # Skip symlinks and hidden files
+        if [ ! -L "$$file" ] && [ "$${filename#.}" = "$$filename" ]; then
+            ln -sf "$$file" "$${EXTERNALSRC_BUILD}/$$filename"
+        fi
+    done
+}
+
+$depends_str
+
+# Kernel modules need to be installed in specific way if strict
+""")
+
+RUST_RECIPE = Template("""SUMMARY = "$project_name Rust application"
+$license_text
+$pn_override
+
+$inherit_class
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+EXTERNALSRC_BUILD = "$${WORKDIR}/build"
+
+$depends_str
+""")
+
+GO_RECIPE = Template("""SUMMARY = "$project_name Go application"
+$license_text
+$pn_override
+
+$inherit_class
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+
+GO_IMPORT = "$go_import"
+GO_INSTALL = "$${GO_IMPORT}/..."
+
+# Remove -buildmode=pie to fix unique.Handle linker errors on some toolchains
+GOBUILDFLAGS:remove = "-buildmode=pie"
+INSANE_SKIP:$${PN} += "textrel"
+
+# Override compile task to work with externalsrc and Go modules
+do_compile() {
+    cd $${EXTERNALSRC}
+    export TMPDIR="$${GOTMPDIR}"
+    export GO111MODULE="on"
+    $${GO} install $${GO_LINKSHARED} $${GOBUILDFLAGS} $${GO_INSTALL}
+}
+
+# Custom install for externalsrc Go projects (skips source install)
+do_install() {
+    install -d $${D}$${bindir}
+    # Check for binaries in standard Go build locations
+    if [ -d $${B}/bin/$${TARGET_GOOS}_$${TARGET_GOARCH} ]; then
+        install -m 0755 $${B}/bin/$${TARGET_GOOS}_$${TARGET_GOARCH}/* $${D}$${bindir}/
+    elif [ -d $${B}/bin ]; then
+        install -m 0755 $${B}/bin/* $${D}$${bindir}/
+    fi
+}
+
+# Allow network access for Go module downloads
+do_compile[network] = "1"
+""")
+
+PYTHON_RECIPE = Template("""SUMMARY = "$project_name Python application"
+$license_text
+$pn_override
+
+$inherit_class
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+
+$depends_str
+""")
+
+# Default fallback for makefile or unknown
+MAKEFILE_RECIPE = Template("""SUMMARY = "$project_name application"
+$license_text
+
+# Use local source code directly
+inherit externalsrc
+EXTERNALSRC = "$${THISDIR}/$rel_project_path"
+
+do_compile() {
+    oe_runmake
+}
+
+do_install() {
+    install -d $${D}$${bindir}
+    install -m 0755 $project_name $${D}$${bindir}
+}
+
+$depends_str
+""")
+
+RECIPE_TEMPLATES = {
+    "cpp": CMAKE_RECIPE,
+    "cmake": CMAKE_RECIPE,
+    "autotools": CMAKE_RECIPE,
+    "module": MODULE_RECIPE,
+    "rust": RUST_RECIPE,
+    "go": GO_RECIPE,
+    "python": PYTHON_RECIPE,
+}
+
+# Crates that bind a system library, and the Yocto recipe providing it.
+# Pure Rust crates are fetched by cargo and need no DEPENDS entry.
+RUST_SYS_CRATE_MAP = {
+    "openssl": "openssl",
+    "openssl-sys": "openssl",
+    "libz-sys": "zlib",
+    "libsqlite3-sys": "sqlite3",
+    "curl-sys": "curl",
+    "libgit2-sys": "libgit2",
+    "libssh2-sys": "libssh2",
+    "libdbus-sys": "dbus",
+}
+
+# Distribution name at the start of a PEP 508 requirement string
+PY_REQUIREMENT_NAME_RE = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+# PEP 503 style normalization: '_' and '.' become '-' in recipe names
+PY_NAME_SEPARATORS = str.maketrans("_.", "--")
+
+def load_toml(path):
+    """Parse a TOML file, returning None if it is missing, invalid or tomllib is unavailable."""
+    # Imported here so only Rust/Python projects pay for loading the parser
+    try:
+        import tomllib
+    except ImportError:
+        # Python < 3.11: Cargo.toml / pyproject.toml dependency detection is skipped
+        return None
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return None
+
+def has_manifest(names, filename):
+    """True if filename may exist; names is the project's directory listing, or None if unknown."""
+    return names is None or filename in names
+
+def detect_rust_dependencies(project_dir, names=None):
+    """Map Cargo.toml dependencies that need a system library to Yocto recipes."""
+    if not has_manifest(names, "Cargo.toml"):
+        return []
+    data = load_toml(project_dir / "Cargo.toml")
+    if not data:
+        return []
+    
+    deps = set()
+    for section in ("dependencies", "build-dependencies"):
+        for crate in data.get(section, {}):
+            if crate in RUST_SYS_CRATE_MAP:
+                deps.add(RUST_SYS_CRATE_MAP[crate])
+    return sorted(deps)
+
+def detect_go_dependencies(project_dir, names=None):
+    """Return the module path declared in go.mod (used as GO_IMPORT), or None."""
+    if not has_manifest(names, "go.mod"):
+        return None
+    try:
+        with open(project_dir / "go.mod", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "module":
+                    return parts[1].strip('"')
+    except OSError:
+        pass
     return None
 
-def detect_python_dependencies(project_dir):
-    # Placeholder
+def get_setup_py_requirements(setup_py):
+    """Read install_requires from setup.py without executing it."""
+    try:
+        source = setup_py.read_text(errors="replace")
+    except OSError:
+        return []
+    # Most setup.py files without requirements can skip the parse entirely
+    if "install_requires" not in source:
+        return []
+    import ast
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            for kw in node.keywords:
+                if kw.arg == "install_requires" and isinstance(kw.value, (ast.List, ast.Tuple)):
+                    return [e.value for e in kw.value.elts if isinstance(e, ast.Constant) and isinstance(e.value, str)]
     return []
 
+def detect_python_dependencies(project_dir, names=None):
+    """Map Python requirements (pyproject.toml, else setup.py) to python3-* recipes."""
+    data = load_toml(project_dir / "pyproject.toml") if has_manifest(names, "pyproject.toml") else None
+    if data and "dependencies" in data.get("project", {}):
+        requirements = data["project"]["dependencies"]
+    elif has_manifest(names, "setup.py"):
+        requirements = get_setup_py_requirements(project_dir / "setup.py")
+    else:
+        requirements = []
+    
+    deps = {
+        f"python3-{match.group(1).lower().translate(PY_NAME_SEPARATORS)}"
+        for match in map(PY_REQUIREMENT_NAME_RE.match, requirements)
+        if match
+    }
+    return sorted(deps)
+
+def is_submodule_registered(workspace_root, rel_path):
+    """Check .gitmodules for a submodule at rel_path without spawning git."""
+    try:
+        content = (workspace_root / ".gitmodules").read_text()
+    except OSError:
+        return False
+    return re.search(rf"^\s*path\s*=\s*{re.escape(rel_path)}\s*$", content, re.MULTILINE) is not None
+
+def canonical_layer_name(name):
+    """Return the layer name with its 'meta-' prefix, adding it only if missing."""
+    return name if name.startswith("meta-") else f"meta-{name}"
+
 def main():
     parser = argparse.ArgumentParser(description="Add a new package/project to Yocto")
     parser.add_argument("project_path", help="Path to project directory or name")
     parser.add_argument("--url", help="Git URL for submodule")
+    parser.add_argument("--shallow", action="store_true", help="Clone the submodule with --depth=1")
     parser.add_argument("--layer", "-l", help="Target layer")
     parser.add_argument("--type", "-t", choices=["auto", "cpp", "cmake", "autotools", "makefile", "module", "rust", "go", "python"], default="auto", help="Project type")
     parser.add_argument("--pv", default="0.1", help="Version")
@@ -59,29 +330,42 @@ def main():
     
     args = parser.parse_args()
     
-    workspace_root = Path(__file__).resolve().parent.parent
-
     if args.url:
         UI.print_item("Git URL", args.url)
         # Treat first arg as name, sanitize it
         project_name = sanitize_yocto_name(args.project_path, "project")
         
-        submodules_dir = workspace_root / "submodules"
-        submodules_dir.mkdir(exist_ok=True)
+        submodules_dir = WORKSPACE_ROOT / "submodules"
         project_dir = submodules_dir / project_name
         
         if project_dir.exists():
             UI.print_warning(f"Submodule directory {project_dir} already exists.")
+        elif is_submodule_registered(WORKSPACE_ROOT, f"submodules/{project_name}"):
+            # git submodule add would refuse anyway; skip the fork and point at the fix.
+            # The directory is empty, so stop before detection writes a recipe for it.
+            UI.print_error(f"Submodule 'submodules/{project_name}' is registered in .gitmodules but not checked out.")
+            print(f"  Run 'git submodule update --init submodules/{project_name}' to check it out.")
+            sys.exit(1)
         else:
-            UI.print_item("Status", f"Adding git submodule '{project_name}'...")
-            if not (workspace_root / ".git").exists():
+            # .git may be a file (worktrees), so test existence rather than isdir
+            if not os.path.exists(WORKSPACE_ROOT / ".git"):
                 UI.print_error("Workspace is not a git repository. Cannot use submodules.", fatal=True)
+            UI.print_item("Status", f"Adding git submodule '{project_name}'...")
+            submodules_dir.mkdir(exist_ok=True)
+            cmd = ["git", "submodule", "add"]
+            if args.shallow:
+                cmd.append("--depth=1")
+            cmd += [args.url, str(project_dir)]
+            # Fail fast on missing credentials instead of blocking on a prompt
+            env = os.environ.copy()
+            env.setdefault("GIT_TERMINAL_PROMPT", "0")
             try:
-                subprocess.run(["git", "submodule", "add", args.url, str(project_dir)], cwd=workspace_root, check=True)
+                subprocess.run(cmd, cwd=WORKSPACE_ROOT, check=True, env=env)
                 UI.print_success("Submodule added.")
             except subprocess.CalledProcessError as e:
                 UI.print_error(f"Failed to add submodule: {e}", fatal=True)
     else:
+        # Resolved once here; every later path computation reuses it
         project_dir = Path(args.project_path).resolve()
         # Sanitize project name
         project_name = sanitize_yocto_name(project_dir.name, "project")
@@ -92,8 +376,8 @@ def main():
     # Auto-detect layer if not specified
     layer_name = args.layer
     if layer_name is None:
-        cached_layer = get_cached_layer(workspace_root)
-        all_layers = get_all_custom_layers(workspace_root)
+        cached_layer = get_cached_layer(WORKSPACE_ROOT)
+        all_layers = get_all_custom_layers(WORKSPACE_ROOT)
         
         if not all_layers:
             UI.print_error("No custom layers found.")
@@ -102,54 +386,46 @@ def main():
         
         if len(all_layers) == 1:
             # Single layer - auto-select
-            layer_name = all_layers[0].name.replace('meta-', '')
-            UI.print_item("Auto-detected layer", f"meta-{layer_name}")
+            layer_name = canonical_layer_name(all_layers[0].name)
+            UI.print_item("Auto-detected layer", layer_name)
         elif cached_layer:
             # Use cached layer
-            layer_name = cached_layer.replace('meta-', '')
-            UI.print_item("Using last-used layer", f"meta-{layer_name}")
+            layer_name = canonical_layer_name(cached_layer)
+            UI.print_item("Using last-used layer", layer_name)
         else:
             # Multiple layers, use first one
-            layer_name = all_layers[0].name.replace('meta-', '')
-            UI.print_item("Using layer", f"meta-{layer_name}")
-    
-    # Prefixing logic
-    if not layer_name.startswith("meta-"):
-        layer_name = f"meta-{layer_name}"
+            layer_name = canonical_layer_name(all_layers[0].name)
+            UI.print_item("Using layer", layer_name)
+    else:
+        layer_name = canonical_layer_name(layer_name)
         
     recipe_subdir = args.recipe_dir
     if not recipe_subdir.startswith("recipes-"):
         recipe_subdir = f"recipes-{recipe_subdir}"
     
+    # Read the project's top-level entries once; type detection and the
+    # license check below are set lookups instead of individual stat calls
+    try:
+        with os.scandir(project_dir) as entries:
+            names = {e.name for e in entries}
+    except OSError:
+        names = set()
+
     # Auto-detection logic
     project_type = args.type
     if project_type == "auto":
-        if (project_dir / "CMakeLists.txt").exists():
-            project_type = "cpp"
-        elif (project_dir / "Cargo.toml").exists():
-            project_type = "rust"
-        elif (project_dir / "go.mod").exists():
-            project_type = "go"
-        elif (project_dir / "setup.py").exists() or (project_dir / "pyproject.toml").exists():
-            project_type = "python"
-        elif (project_dir / "configure.ac").exists() or (project_dir / "Makefile.am").exists():
-            project_type = "autotools"
-        elif (project_dir / "Makefile").exists():
-            project_type = "makefile"
-        else:
+        project_type = next((ptype for markers, ptype in PROJECT_MARKERS if not markers.isdisjoint(names)), None)
+        if project_type is None:
             UI.print_warning("Could not auto-detect project type. Defaulting to 'cpp'.")
             project_type = "cpp"
     
     UI.print_item("Project Type", project_type)
     
     # Define paths
-    layer_dir = workspace_root / "yocto" / "layers" / layer_name
+    layer_dir = WORKSPACE_ROOT / "yocto" / "layers" / layer_name
     recipe_dir = layer_dir / recipe_subdir / project_name
     recipe_file = recipe_dir / f"{project_name}_{args.pv}.bb"
 
-    # Create directories
-    recipe_dir.mkdir(parents=True, exist_ok=True)
-
     # Calculate relative path from recipe directory to project directory
     try:
         rel_project_path = os.path.relpath(project_dir, recipe_dir)
@@ -161,187 +437,54 @@ def main():
     detected_deps = []
     go_module_path = None
     if project_type in ["cpp", "cmake"]:
-        detected_deps = detect_dependencies(project_dir, workspace_root, layer_dir)
+        detected_deps = detect_dependencies(project_dir, WORKSPACE_ROOT, layer_dir)
     elif project_type == "rust":
-        detected_deps = detect_rust_dependencies(project_dir)
+        detected_deps = detect_rust_dependencies(project_dir, names)
     elif project_type == "go":
-        go_module_path = detect_go_dependencies(project_dir)
+        go_module_path = detect_go_dependencies(project_dir, names)
         if go_module_path:
             UI.print_item("Go Module", go_module_path)
     elif project_type == "python":
-        detected_deps = detect_python_dependencies(project_dir)
+        detected_deps = detect_python_dependencies(project_dir, names)
     
     if detected_deps:
         UI.print_item("Dependencies", ', '.join(detected_deps))
     
     # Recipe base content
-    inherit_class = ""
-    if project_type in ["cpp", "cmake"]:
-        inherit_class = "inherit cmake"
-    elif project_type == "autotools":
-        inherit_class = "inherit autotools"
-    elif project_type == "module":
-        inherit_class = "inherit module"
-    elif project_type == "rust":
-        inherit_class = "inherit cargo"
-    elif project_type == "go":
-        inherit_class = "inherit go"
-    elif project_type == "python":
-        inherit_class = "inherit setuptools3"
+    inherit_class = INHERIT_CLASSES.get(project_type, "")
     
     # Basic license handling
     license_text = 'LICENSE = "CLOSED"'
-    lic_file = project_dir / "LICENSE"
-    if lic_file.exists():
+    if "LICENSE" in names:
         license_text = 'LICENSE = "MIT"\nLIC_FILES_CHKSUM = "file://${COMMON_LICENSE_DIR}/MIT;md5=0835ade698e0bcf8506ecda2f7b4f302"'
                 
     depends_str = ""
     if detected_deps:
-        depends_str = f'DEPENDS = "{" ".join(detected_deps)}"'
-
-    # Initialize pn_override
-    pn_override = ""
-
-    # Recipe Content
-    if project_type in ["cpp", "cmake", "autotools"]:
-        recipe_content = f"""SUMMARY = "{project_name} application"
-{license_text}
-
-{inherit_class}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-EXTERNALSRC_BUILD = "${{WORKDIR}}/build"
-
-{depends_str}
-"""
-    
-    elif project_type == "module":
-        recipe_content = f"""SUMMARY = "{project_name} kernel module"
-{license_text}
-{pn_override}
-
-{inherit_class}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-EXTERNALSRC_BUILD = "${{WORKDIR}}/build"
-
-# Set up build directory with symlinks to source files
-do_configure:prepend() {{
-    # Create build directory
-    mkdir -p ${{EXTERNALSRC_BUILD}}
-    
-    # Symlink source files to build directory
-    for file in ${{EXTERNALSRC}}/*; do
-        filename=$(basename "$file")
-        # Skip symlinks and hidden files
-        if [ ! -L "$file" ] && [ "${{filename#.}}" = "$filename" ]; then
-            ln -sf "$file" "${{EXTERNALSRC_BUILD}}/$filename"
-        fi
-    done
-}}
-
-{depends_str}
-
-# Kernel modules need to be installed in specific way if strict
-"""
-
-    elif project_type == "rust":
-        recipe_content = f"""SUMMARY = "{project_name} Rust application"
-{license_text}
-{pn_override}
-
-{inherit_class}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-EXTERNALSRC_BUILD = "${{WORKDIR}}/build"
-
-{depends_str}
-"""
-
-    elif project_type == "go":
-        go_import = go_module_path if go_module_path else project_name
-        recipe_content = f"""SUMMARY = "{project_name} Go application"
-{license_text}
-{pn_override}
-
-{inherit_class}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-
-GO_IMPORT = "{go_import}"
-GO_INSTALL = "${{GO_IMPORT}}/..."
-
-# Remove -buildmode=pie to fix unique.Handle linker errors on some toolchains
-GOBUILDFLAGS:remove = "-buildmode=pie"
-INSANE_SKIP:${{PN}} += "textrel"
-
-# Override compile task to work with externalsrc and Go modules
-do_compile() {{
-    cd ${{EXTERNALSRC}}
-    export TMPDIR="${{GOTMPDIR}}"
-    export GO111MODULE="on"
-    ${{GO}} install ${{GO_LINKSHARED}} ${{GOBUILDFLAGS}} ${{GO_INSTALL}}
-}}
-
-# Custom install for externalsrc Go projects (skips source install)
-do_install() {{
-    install -d ${{D}}${{bindir}}
-    # Check for binaries in standard Go build locations
-    if [ -d ${{B}}/bin/${{TARGET_GOOS}}_${{TARGET_GOARCH}} ]; then
-        install -m 0755 ${{B}}/bin/${{TARGET_GOOS}}_${{TARGET_GOARCH}}/* ${{D}}${{bindir}}/
-    elif [ -d ${{B}}/bin ]; then
-        install -m 0755 ${{B}}/bin/* ${{D}}${{bindir}}/
-    fi
-}}
-
-# Allow network access for Go module downloads
-do_compile[network] = "1"
-"""
-
-    elif project_type == "python":
-        recipe_content = f"""SUMMARY = "{project_name} Python application"
-{license_text}
-{pn_override}
-
-{inherit_class}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-
-{depends_str}
-"""
-    # Default fallback for makefile or unknown
-    else: 
-         recipe_content = f"""SUMMARY = "{project_name} application"
-{license_text}
-
-# Use local source code directly
-inherit externalsrc
-EXTERNALSRC = "${{THISDIR}}/{rel_project_path}"
-
-do_compile() {{
-    oe_runmake
-}}
-
-do_install() {{
-    install -d ${{D}}${{bindir}}
-    install -m 0755 {project_name} ${{D}}${{bindir}}
-}}
-
-{depends_str}
-"""
-
-    with open(recipe_file, "w") as f:
-        f.write(recipe_content)
+        # Python requirements are needed on the target at runtime, not at build time
+        depends_var = "RDEPENDS:${PN}" if project_type == "python" else "DEPENDS"
+        depends_str = f'{depends_var} = "{" ".join(detected_deps)}"'
+
+    recipe_content = RECIPE_TEMPLATES.get(project_type, MAKEFILE_RECIPE).substitute(
+        project_name=project_name,
+        license_text=license_text,
+        inherit_class=inherit_class,
+        rel_project_path=rel_project_path,
+        depends_str=depends_str,
+        pn_override="",
+        go_import=go_module_path if go_module_path else project_name,
+    )
+
+    # Write the whole recipe to a temp file in one unbuffered call, then swap it in
+    # so BitBake never sees a partially written recipe
+    tmp_file = recipe_file.with_suffix(".bb.tmp")
+    data = recipe_content.encode("utf-8")
+    try:
+        tmp_file.write_bytes(data)
+    except FileNotFoundError:
+        # First recipe in this directory; re-runs skip the mkdir chain
+        recipe_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file.write_bytes(data)
+    os.replace(tmp_file, recipe_file)
 
     UI.print_success(f"Created {project_type} recipe for '{project_name}'")
     UI.print_item("Path", str(recipe_file))
@@ -356,14 +499,11 @@ do_install() {{
     if add_to_image_flag:
         image_name = args.image
         if not image_name:
-            image_name = get_cached_image(workspace_root)
+            image_name = get_cached_image(WORKSPACE_ROOT)
         
-        # Build env info
-        bitbake_yocto_dir = get_bitbake_yocto_dir(workspace_root)
-        build_dir = bitbake_yocto_dir / "build"
         if not image_name:
             # Try to find custom images
-            layer_path = find_custom_layer(workspace_root)
+            layer_path = find_custom_layer(WORKSPACE_ROOT)
             images = find_image_recipes(layer_path)
             if images:
                 image_name = images[0] # Default to first found
@@ -371,17 +511,19 @@ do_install() {{
         
         if image_name:
             UI.print_item("Integration", f"Adding to {image_name}...")
-            if add_package_to_image(workspace_root, image_name, project_name):
+            if add_package_to_image(WORKSPACE_ROOT, image_name, project_name):
                 UI.print_success(f"Successfully added '{project_name}' to {image_name}")
-                set_cached_image(workspace_root, image_name)
+                set_cached_image(WORKSPACE_ROOT, image_name)
             else:
                 UI.print_error(f"Failed to add '{project_name}' to {image_name}")
     else:
         UI.print_item("Image Integration", "Skipped (library or disabled)")
 
-    print(f"\n  {UI.BOLD}Action Required:{UI.NC}")
-    print(f"    Run 'yocto-build {project_name}' to build recipe.")
-    print(f"    Run 'yocto-build {image_name or 'core-image-falcon'}' to build image.")
+    print("\n".join([
+        ACTION_REQUIRED,
+        f"    Run 'yocto-build {project_name}' to build recipe.",
+        f"    Run 'yocto-build {image_name or 'core-image-falcon'}' to build image.",
+    ]))
 
 if __name__ == "__main__":
     main()
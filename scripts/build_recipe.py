@@ -29,18 +29,20 @@ def main():
         # Try to find layer and recipes
         try:
             layer_dir = find_custom_layer(workspace_root, None)
-            recipes = find_image_recipes(layer_dir)
             
-            if recipes:
-                if cached_image and cached_image in recipes:
-                    target = cached_image
-                    UI.print_item("Selected", f"Last-used image: {target}")
-                elif len(recipes) == 1:
+            # A still-present cached image only needs its own recipe checked,
+            # not a listing of every image in the layer
+            if cached_image and (layer_dir / "recipes-images" / "images" / f"{cached_image}.bb").is_file():
+                target = cached_image
+                UI.print_item("Selected", f"Last-used image: {target}")
+            else:
+                recipes = find_image_recipes(layer_dir)
+                if len(recipes) == 1:
                     target = recipes[0]
                     UI.print_item("Selected", f"Auto-detected: {target}")
-                else:
-                    # Multiple recipes, use cached or first
-                    target = cached_image if (cached_image and cached_image in recipes) else recipes[0]
+                elif recipes:
+                    # Multiple recipes, use the first
+                    target = recipes[0]
                     UI.print_item("Selected", target)
         except RuntimeError:
             pass
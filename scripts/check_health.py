@@ -3,17 +3,19 @@ import os
 import sys
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI, find_custom_layer, get_all_custom_layers, find_built_images, get_bitbake_yocto_dir
+from yocto_utils import UI, find_custom_layer, get_all_custom_layers, find_built_images, get_bitbake_yocto_dir, get_layer_recipe_prefixes
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
 
 def format_size(size):
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size < 1024:
-            return f"{size:.1f} {unit}"
-        size /= 1024
+    # Each unit is 2**10 of the previous one, so the bit length picks the unit directly
+    i = max(0, min((int(size).bit_length() - 1) // 10, len(SIZE_UNITS) - 1))
+    return f"{size / (1 << (i * 10)):.1f} {SIZE_UNITS[i]}"
 
 def check_disk_space(path):
     total, used, free = shutil.disk_usage(path)
@@ -25,11 +27,26 @@ def check_disk_space(path):
         "percent": percent
     }
 
+def count_sstate(sstate_dir):
+    # Count entries straight from the directory stream; no Path objects needed
+    try:
+        with os.scandir(sstate_dir) as entries:
+            return sum(1 for e in entries if not e.name.startswith("."))
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # Present but unreadable or not a directory: report it as empty, like glob did
+        return 0
+
+# Colour codes are fixed at import, so the labels are built once
+STATUS_LABELS = {
+    "OK": f"{UI.GREEN}[ OK ]{UI.NC}",
+    "WARN": f"{UI.YELLOW}[ WARN ]{UI.NC}",
+    "CRIT": f"{UI.RED}[ CRIT ]{UI.NC}",
+}
+
 def get_status_label(level):
-    if level == "OK": return f"{UI.GREEN}[ OK ]{UI.NC}"
-    if level == "WARN": return f"{UI.YELLOW}[ WARN ]{UI.NC}"
-    if level == "CRIT": return f"{UI.RED}[ CRIT ]{UI.NC}"
-    return f"[ {level} ]"
+    return STATUS_LABELS.get(level) or f"[ {level} ]"
 
 def check_workspace():
     workspace_root = Path(__file__).resolve().parent.parent
@@ -37,12 +54,21 @@ def check_workspace():
     build_dir = bitbake_yocto_dir / "build"
     sstate_dir = workspace_root / "bitbake-builds" / "shared" / "sstate-cache"
     
+    bitbake_path = bitbake_yocto_dir / "layers" / "bitbake"
+    
+    # The probes below are independent and I/O bound, so start them together
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        disk_future = pool.submit(check_disk_space, workspace_root)
+        sstate_future = pool.submit(count_sstate, sstate_dir)
+        bb_future = pool.submit(bitbake_path.exists)
+        build_future = pool.submit(build_dir.exists)
+    
     UI.print_header("Yocto Workspace Health Dashboard")
     
     # 1. Disk Space
     UI.print_item("Check", "Disk Space")
     try:
-        disk = check_disk_space(workspace_root)
+        disk = disk_future.result()
         status = "OK"
         if disk['percent'] > 90: status = "CRIT"
         elif disk['percent'] > 80: status = "WARN"
@@ -54,20 +80,22 @@ def check_workspace():
         
     # 2. Cache Status
     UI.print_item("Check", "Cache Health")
-    if sstate_dir.exists():
-        count = len(list(sstate_dir.glob("*")))
-        status = "OK" if count > 0 else "WARN"
-        print(f"  {get_status_label(status)} SState Cache: ~{count} objects in shared cache")
-    else:
-        print(f"  {get_status_label('WARN')} SState Cache: Not found (Shared cache not initialized?)")
+    try:
+        count = sstate_future.result()
+        if count is not None:
+            status = "OK" if count > 0 else "WARN"
+            print(f"  {get_status_label(status)} SState Cache: ~{count} objects in shared cache")
+        else:
+            print(f"  {get_status_label('WARN')} SState Cache: Not found (Shared cache not initialized?)")
+    except Exception as e:
+        print(f"  {get_status_label('WARN')} Error checking sstate cache: {e}")
         
     # 3. Environment Status
     UI.print_item("Check", "Environment")
-    bitbake_path = bitbake_yocto_dir / "layers" / "bitbake"
-    bb_status = "OK" if bitbake_path.exists() else "CRIT"
+    bb_status = "OK" if bb_future.result() else "CRIT"
     print(f"  {get_status_label(bb_status)} BitBake Tools")
     
-    build_status = "OK" if build_dir.exists() else "WARN"
+    build_status = "OK" if build_future.result() else "WARN"
     print(f"  {get_status_label(build_status)} Build Folder")
         
     # 4. Layer Sanity
@@ -78,25 +106,27 @@ def check_workspace():
              print(f"  {get_status_label('CRIT')} No custom layers found")
         else:
             custom_layer = custom_layers[0]
-            conf = custom_layer / "conf" / "layer.conf"
-            status = "OK" if conf.exists() else "CRIT"
-            print(f"  {get_status_label(status)} {custom_layer.name} layer")
+            # get_all_custom_layers only returns layers with a conf/layer.conf
+            print(f"  {get_status_label('OK')} {custom_layer.name} layer")
             
             # 5. Local Projects
             UI.print_item("Check", "Local Projects")
             sw_dir = workspace_root / "sw"
             if sw_dir.exists():
+                # scandir answers is_dir() from the dirent type, without a stat per entry
                 projects = []
-                for d in sw_dir.iterdir():
-                  if d.is_dir():
-                    for p in d.iterdir():
-                      if p.is_dir():
-                        projects.append(p)
+                with os.scandir(sw_dir) as groups:
+                    for group in groups:
+                        if group.is_dir():
+                            with os.scandir(group.path) as entries:
+                                projects.extend(e.name for e in entries if e.is_dir())
+                projects.sort()
                 
                 print(f"  Total Projects: {len(projects)}")
-                for p_path in projects:
-                    p = p_path.name
-                    recipe_exists = any((custom_layer).rglob(f"{p}_*.bb"))
+                # One walk of the layer instead of an rglob per project
+                recipes = get_layer_recipe_prefixes(custom_layer)
+                for p in projects:
+                    recipe_exists = p in recipes
                     status = "OK" if recipe_exists else "WARN"
                     label = "REGISTERED" if recipe_exists else "UNREGISTERED"
                     print(f"    {get_status_label(status)} {p:15} ({label})")
@@ -3,16 +3,20 @@ import os
 import sys
 import argparse
 import re
+from functools import lru_cache
 from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI, get_bitbake_yocto_dir
+from yocto_utils import UI, get_bitbake_yocto_dir, get_bblayers, get_layer_collection_name
 
 WORKSPACE_ROOT = Path(__file__).resolve().parent.parent
 BUILD_DIR = get_bitbake_yocto_dir(WORKSPACE_ROOT) / "build"
 TOOLCFG_PATH = BUILD_DIR / "conf" / "toolcfg.conf"
 
+# OE_FRAGMENTS += "..." line: group 1 is the assignment prefix, group 2 the fragment list
+OE_FRAGMENTS_RE = re.compile(r'(OE_FRAGMENTS\s*\+=\s*)"([^"]*)"')
+
 def main():
     parser = argparse.ArgumentParser(description="Manage Yocto configuration fragments (yocto-config)")
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
@@ -49,16 +53,23 @@ def main():
     else:
         list_fragments()
 
+@lru_cache(maxsize=4)
+def parse_fragments(path, mtime_ns, size, ino):
+    """Parse OE_FRAGMENTS from a toolcfg.conf; the stat fields are part of the cache key so edits invalidate it."""
+    # The assignment sits on one line, so stop reading at the first match
+    with open(path) as f:
+        for line in f:
+            match = OE_FRAGMENTS_RE.search(line)
+            if match:
+                # Split by whitespace and filter empty strings
+                return tuple(frag.strip() for frag in match.group(2).split())
+    return ()
+
 def get_fragments():
-    """Read and parse OE_FRAGMENTS from toolcfg.conf."""
+    """Read and parse OE_FRAGMENTS from toolcfg.conf (cached until the file changes)."""
     try:
-        content = TOOLCFG_PATH.read_text()
-        match = re.search(r'OE_FRAGMENTS\s*\+=\s*"([^"]*)"', content)
-        if match:
-            # Split by whitespace and filter empty strings
-            fragments = [f.strip() for f in match.group(1).split()]
-            return fragments
-        return []
+        st = TOOLCFG_PATH.stat()
+        return list(parse_fragments(str(TOOLCFG_PATH), st.st_mtime_ns, st.st_size, st.st_ino))
     except Exception as e:
         UI.print_error(f"Failed to read toolcfg.conf: {e}")
         return []
@@ -73,19 +84,16 @@ def save_fragments(fragments):
         
         # Replace the OE_FRAGMENTS line
         # We look for the line with OE_FRAGMENTS += "..."
-        new_content = re.sub(
-            r'(OE_FRAGMENTS\s*\+=\s*)"([^"]*)"', 
-            f'\\1"{new_val}"', 
-            content
-        )
+        new_content, replaced = OE_FRAGMENTS_RE.subn(lambda m: f'{m.group(1)}"{new_val}"', content)
         
-        # If no match/substitution happened (maybe empty list case logic needed?), append it?
-        # Assuming the file structure is static as seen in cat output.
-        if new_content == content and "OE_FRAGMENTS" not in content:
+        # If no substitution happened and there is no OE_FRAGMENTS line at all, append one
+        if not replaced and "OE_FRAGMENTS" not in content:
              UI.print_warning("OE_FRAGMENTS not found in toolcfg.conf. Appending...")
              new_content += f'\nOE_FRAGMENTS += "{new_val}"\n'
              
         TOOLCFG_PATH.write_text(new_content)
+        # A rewrite within one timestamp tick can keep the same mtime, so drop cached parses explicitly
+        parse_fragments.cache_clear()
         return True
     except Exception as e:
         UI.print_error(f"Failed to write toolcfg.conf: {e}")
@@ -125,14 +133,23 @@ def disable_fragment(fragment):
         UI.print_success(f"Disabled '{fragment}'")
 
 
+def iter_conf_files(root):
+    """Yield the path of every .conf file under root, walking with os.scandir (no stat per entry)."""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".conf"):
+                        yield entry.path
+        except OSError:
+            continue
+
 def get_available_fragments():
     """Scan layers for available configuration fragments."""
-    try:
-        from yocto_utils import get_bblayers, get_layer_collection_name
-        layers = get_bblayers(WORKSPACE_ROOT)
-    except ImportError:
-        UI.print_error("Could not import get_bblayers from yocto_utils")
-        return {}
+    layers = get_bblayers(WORKSPACE_ROOT)
 
     available = {} # dict of fragment_name -> path
 
@@ -146,15 +163,14 @@ def get_available_fragments():
         if not collection:
             collection = layer.name
             
-        # Look for conf/fragments/*.conf
-        fragment_dir = layer / "conf" / "fragments"
-        if fragment_dir.exists():
-            for conf in fragment_dir.rglob("*.conf"):
-                rel_path = conf.relative_to(fragment_dir)
-                # Fragment name is collection/path/to/fragment (without .conf)
-                # e.g. core/yocto/root-login-with-empty-password
-                name = f"{collection}/{str(rel_path.with_suffix(''))}"
-                available[name] = conf
+        # Look for conf/fragments/*.conf (a missing directory simply yields nothing)
+        fragment_dir = os.path.join(layer, "conf", "fragments")
+        for conf in iter_conf_files(fragment_dir):
+            # Fragment name is collection/path/to/fragment (without .conf)
+            # e.g. core/yocto/root-login-with-empty-password
+            rel_path = os.path.relpath(conf, fragment_dir)[:-len(".conf")]
+            name = f"{collection}/{rel_path}"
+            available[name] = Path(conf)
     return available
 
 def list_available_fragments():
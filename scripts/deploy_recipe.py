@@ -1,14 +1,202 @@
 #!/usr/bin/env python3
 import sys
 import os
+import re
+import shlex
 import subprocess
 import argparse
 import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI
+from yocto_utils import UI, stream_command
+
+# Matches the two variables deploy needs from `bitbake -e`, e.g. WORKDIR="/path"
+ENV_VAR_RE = re.compile(r'(WORKDIR|TMPDIR)="?([^"\n]*)"?')
+
+# A leading ~ or ~user/ that the remote shell should still expand
+TILDE_PREFIX_RE = re.compile(r'~[\w.-]*(?:/|$)')
+
+# Copies are latency-bound syscalls, so more threads than cores still helps
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def spawn_cmd(program, *args):
+    """
+    Build an argv with the program resolved to a full path. Together with
+    close_fds=False (safe: Python's own descriptors are non-inheritable, PEP 446)
+    this lets subprocess start it with posix_spawn instead of fork+exec.
+    """
+    return [shutil.which(program) or program, *args]
+
+def copy_file_contents(src, dest, size):
+    """
+    Copy file data without passing it through userspace: copy_file_range where
+    available (which can reflink on the same filesystem), else shutil.copyfile (sendfile).
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+                remaining = size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            return
+        except OSError:
+            # Unsupported filesystem/kernel (EXDEV, ENOSYS, EINVAL...): fall back below
+            pass
+    shutil.copyfile(src, dest)
+
+def copy_file_with_metadata(src, dest, st):
+    """Copy one file and apply the mode and timestamps from its stat result."""
+    copy_file_contents(src, dest, st.st_size)
+    os.chmod(dest, stat.S_IMODE(st.st_mode))
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def list_tree_files(src_root):
+    """
+    Walk src_root once with os.scandir and return (path, relative path, stat)
+    for every file, following file symlinks like Path.is_file() does.
+    """
+    files = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(src_root, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    # The DirEntry's cached stat supplies the metadata later
+                    files.append((entry.path, rel_path, entry.stat()))
+    return files
+
+def copy_tree_files(src_root, dest_root):
+    """
+    Copy every file under src_root to the same relative path under dest_root,
+    keeping permissions and timestamps (like shutil.copy2).
+    The tree is walked and destination directories created first; the file
+    copies then run on a thread pool.
+    Returns the relative paths of the copied files.
+    """
+    tasks = []
+    copied = []
+    made_dirs = set()
+    for src, rel_path, st in list_tree_files(src_root):
+        dest_file = os.path.join(dest_root, rel_path)
+        # One makedirs per destination directory, not per file
+        dest_dir = os.path.dirname(dest_file)
+        if dest_dir not in made_dirs:
+            os.makedirs(dest_dir, exist_ok=True)
+            made_dirs.add(dest_dir)
+        tasks.append((src, dest_file, st))
+        copied.append(rel_path)
+    
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+        # Consume the results so a failed copy raises here
+        for _ in pool.map(lambda task: copy_file_with_metadata(*task), tasks):
+            pass
+    return copied
+
+def rsync_local(src_root, dest_dir):
+    """
+    Copy every file under src_root to dest_dir with a single rsync run.
+    rsync is handed the same file list copy_tree_files would copy (file symlinks
+    followed, permissions and timestamps kept), so the result doesn't depend on
+    which path runs.
+    Returns the relative paths of the deployed files, or None if rsync is not installed.
+    """
+    rsync = shutil.which("rsync")
+    if not rsync:
+        return None
+    
+    rel_paths = [rel_path for _, rel_path, _ in list_tree_files(src_root)]
+    rsync_cmd = [rsync, "-tp", "--copy-links", "--from0", "--files-from=-", f"{src_root}/", f"{dest_dir}/"]
+    
+    result = subprocess.run(rsync_cmd, input="\0".join(rel_paths), stderr=subprocess.PIPE, text=True, close_fds=False)
+    if result.returncode != 0:
+        UI.print_error("Local copy failed")
+        print(f"      {result.stderr.strip()}")
+        sys.exit(1)
+    return rel_paths
+
+def quote_remote_path(path):
+    """Quote a path for the remote shell, leaving a leading ~ or ~user/ unquoted so it still expands."""
+    match = TILDE_PREFIX_RE.match(path)
+    if not match:
+        return shlex.quote(path)
+    rest = path[match.end():]
+    return match.group(0) + (shlex.quote(rest) if rest else "")
+
+def transfer_to_remote(source_dirs, remote_host, remote_path, ssh_opts, checksum=False):
+    """
+    Send the merged contents of source_dirs to remote_host:remote_path with rsync,
+    falling back to tar over ssh. The trees are read in place; nothing is staged locally.
+    With checksum, rsync compares file contents instead of size and mtime.
+    """
+    UI.print_item("Action", "Transferring to remote target...")
+    
+    # Try rsync first (faster and more efficient)
+    # --relative with a '/./' marker roots each tree at the destination, merging them.
+    # -W sends changed files whole: deploy targets rarely have an older copy worth delta-encoding.
+    # No --inplace: overwriting a binary the target is running fails (ETXTBSY) or crashes it,
+    # and an interrupted transfer would leave half-written files behind.
+    rsync_cmd = spawn_cmd("rsync", "-aWz", "--relative", "--info=stats2,progress2")
+    
+    # Rebuilds touch every mtime, so only a checksum tells which files really changed
+    if checksum:
+        rsync_cmd.append("-c")
+    
+    # Add SSH options if provided
+    if ssh_opts:
+        rsync_cmd.extend(["-e", f"ssh {ssh_opts}"])
+    
+    # Add source and destination
+    rsync_cmd.extend(f"{d}/./" for d in source_dirs)
+    rsync_cmd.append(f"{remote_host}:{remote_path}/")
+    
+    # Progress goes straight to the terminal; stderr is kept to detect a missing remote rsync
+    result = subprocess.run(rsync_cmd, stderr=subprocess.PIPE, text=True, close_fds=False)
+    if result.returncode == 0:
+        return
+    
+    # If rsync failed, try scp as fallback
+    if "rsync: not found" not in result.stderr and "command not found" not in result.stderr:
+        UI.print_error("Remote transfer failed")
+        print(f"      {result.stderr}")
+        sys.exit(1)
+    
+    UI.print_warning("rsync not available on target, using scp...")
+    
+    # Use tar + ssh for efficient directory transfer
+    tar_cmd = spawn_cmd("tar", "-czf", "-")
+    for d in source_dirs:
+        tar_cmd.extend(["-C", d, "."])
+    ssh_cmd = spawn_cmd("ssh")
+    
+    if ssh_opts:
+        ssh_cmd.extend(ssh_opts.split())
+    
+    # The remote command goes through the target's shell
+    ssh_cmd.extend([remote_host, f"tar -xzf - -C {quote_remote_path(remote_path)}"])
+    
+    # Pipe tar through ssh
+    tar_proc = subprocess.Popen(tar_cmd, stdout=subprocess.PIPE, close_fds=False)
+    ssh_proc = subprocess.Popen(ssh_cmd, stdin=tar_proc.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=False)
+    tar_proc.stdout.close()
+    
+    stdout, stderr = ssh_proc.communicate()
+    
+    if ssh_proc.returncode != 0:
+        UI.print_error("Remote transfer failed")
+        if stderr:
+            print(f"      {stderr.decode()}")
+        sys.exit(1)
 
 def main():
     parser = argparse.ArgumentParser(description="Build and deploy a Yocto recipe to an installation directory or remote target")
@@ -18,6 +206,7 @@ def main():
     parser.add_argument("--clean", action="store_true", help="Clean before building")
     parser.add_argument("--no-build", action="store_true", help="Skip build, just deploy existing artifacts")
     parser.add_argument("--ssh-opts", default="", help="Additional SSH options (e.g., '-p 2222 -i key.pem')")
+    parser.add_argument("--checksum", action="store_true", help="Compare file contents instead of timestamps when re-deploying to a remote target")
     args = parser.parse_args()
     
     workspace_root = Path(__file__).resolve().parent.parent
@@ -37,10 +226,10 @@ def main():
     if not args.no_build:
         if args.clean:
             UI.print_item("Action", "Cleaning...")
-            subprocess.run(["bitbake", "-c", "clean", args.target])
+            subprocess.run(spawn_cmd("bitbake", "-c", "clean", args.target), close_fds=False)
         
         UI.print_item("Action", "Building...")
-        result = subprocess.run(["bitbake", args.target])
+        result = subprocess.run(spawn_cmd("bitbake", args.target), close_fds=False)
         
         if result.returncode != 0:
             UI.print_error("Build failed.")
@@ -50,27 +239,23 @@ def main():
     # Find the recipe's deploy directory
     UI.print_item("Status", "Deploying artifacts...")
     
-    # Get TMPDIR from bitbake environment
-    result = subprocess.run(
-        ["bitbake", "-e", args.target],
-        capture_output=True,
-        text=True
-    )
+    # Parse WORKDIR (and TMPDIR) from bitbake -e output (most reliable).
+    # The dump runs to tens of MB, so stream it and stop once both are found.
+    env_vars = {}
     
-    if result.returncode != 0:
+    try:
+        for line in stream_command(spawn_cmd("bitbake", "-e", args.target), close_fds=False):
+            match = ENV_VAR_RE.match(line)
+            if match:
+                env_vars[match.group(1)] = match.group(2)
+                if len(env_vars) == 2:
+                    break
+    except (subprocess.CalledProcessError, OSError):
         UI.print_error("Could not get recipe environment")
         sys.exit(1)
     
-    # Parse WORKDIR from bitbake -e output (most reliable)
-    workdir = None
-    tmpdir = None
-    
-    for line in result.stdout.split('\n'):
-        if line.startswith('WORKDIR='):
-            workdir = line.split('=', 1)[1].strip('"')
-        elif line.startswith('TMPDIR='):
-            tmpdir = line.split('=', 1)[1].strip('"')
-    
+    workdir = env_vars.get('WORKDIR')
+    tmpdir = env_vars.get('TMPDIR')
     if not workdir:
         UI.print_error("Could not determine WORKDIR")
         UI.print_warning("Make sure the recipe exists and built successfully")
@@ -109,109 +294,44 @@ def main():
         dest_dir.mkdir(parents=True, exist_ok=True)
     
     deployed_count = 0
-    temp_deploy_dir = None
-    
-    # For remote deployment, create a temporary staging directory
-    if is_remote:
-        import tempfile
-        temp_deploy_dir = Path(tempfile.mkdtemp(prefix="yocto-deploy-"))
-        actual_dest = temp_deploy_dir
-    else:
-        actual_dest = dest_dir
+    source_dirs = []
     
     # Deploy from image directory (preferred - contains installed files)
     if image_dir.exists():
         UI.print_item("Source", "image directory")
-        for item in image_dir.rglob("*"):
-            if item.is_file():
-                rel_path = item.relative_to(image_dir)
-                dest_file = actual_dest / rel_path
-                dest_file.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(item, dest_file)
-                deployed_count += 1
-                # Show actual install path for remote, relative path for local
-                if is_remote:
-                    print(f"      {remote_path.rstrip('/')}/{rel_path}")
-                else:
-                    print(f"      {rel_path}")
+        source_dirs = [str(image_dir)]
     
     # Also check packages-split for additional files
     elif packages_split.exists():
         UI.print_item("Source", "packages-split")
-        for package_dir in packages_split.iterdir():
-            if package_dir.is_dir():
-                for item in package_dir.rglob("*"):
-                    if item.is_file():
-                        rel_path = item.relative_to(package_dir)
-                        dest_file = actual_dest / rel_path
-                        dest_file.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(item, dest_file)
-                        deployed_count += 1
-                        # Show actual install path for remote, relative path for local
-                        if is_remote:
-                            print(f"      {remote_path.rstrip('/')}/{rel_path}")
-                        else:
-                            print(f"      {rel_path}")
+        with os.scandir(packages_split) as package_dirs:
+            source_dirs = sorted(e.path for e in package_dirs if e.is_dir())
     else:
         UI.print_warning("No image or packages-split directory found")
         print(f"  This recipe may not install any files.")
     
+    if is_remote:
+        # No local staging copy: the transfer reads straight from the source trees
+        deployed = [rel_path for d in source_dirs for _, rel_path, _ in list_tree_files(d)]
+    else:
+        deployed = []
+        for source_dir in source_dirs:
+            copied = rsync_local(source_dir, dest_dir)
+            if copied is None:
+                copied = copy_tree_files(source_dir, dest_dir)
+            deployed.extend(copied)
+    
+    for rel_path in deployed:
+        deployed_count += 1
+        # Show actual install path for remote, relative path for local
+        if is_remote:
+            print(f"      {remote_path.rstrip('/')}/{rel_path}")
+        else:
+            print(f"      {rel_path}")
+    
     # If remote, use rsync to transfer (with scp fallback)
     if is_remote and deployed_count > 0:
-        UI.print_item("Action", "Transferring to remote target...")
-        
-        # Try rsync first (faster and more efficient)
-        rsync_cmd = ["rsync", "-avz", "--progress"]
-        
-        # Add SSH options if provided
-        if args.ssh_opts:
-            rsync_cmd.extend(["-e", f"ssh {args.ssh_opts}"])
-        
-        # Add source and destination
-        rsync_cmd.append(f"{temp_deploy_dir}/")
-        rsync_cmd.append(f"{remote_host}:{remote_path}/")
-        
-        result = subprocess.run(rsync_cmd, capture_output=True, text=True)
-        
-        # If rsync failed, try scp as fallback
-        if result.returncode != 0:
-            if "rsync: not found" in result.stderr or "command not found" in result.stderr:
-                UI.print_warning("rsync not available on target, using scp...")
-                
-                # Use tar + ssh for efficient directory transfer
-                tar_cmd = ["tar", "-czf", "-", "-C", str(temp_deploy_dir), "."]
-                ssh_cmd = ["ssh"]
-                
-                if args.ssh_opts:
-                    ssh_cmd.extend(args.ssh_opts.split())
-                
-                ssh_cmd.extend([remote_host, f"tar -xzf - -C {remote_path}"])
-                
-                # Pipe tar through ssh
-                tar_proc = subprocess.Popen(tar_cmd, stdout=subprocess.PIPE)
-                ssh_proc = subprocess.Popen(ssh_cmd, stdin=tar_proc.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                tar_proc.stdout.close()
-                
-                stdout, stderr = ssh_proc.communicate()
-                
-                # Clean up temp directory
-                shutil.rmtree(temp_deploy_dir)
-                
-                if ssh_proc.returncode != 0:
-                    UI.print_error("Remote transfer failed")
-                    if stderr:
-                        print(f"      {stderr.decode()}")
-                    sys.exit(1)
-            else:
-                # Clean up temp directory
-                shutil.rmtree(temp_deploy_dir)
-                UI.print_error("Remote transfer failed")
-                print(f"      {result.stderr}")
-                sys.exit(1)
-        else:
-            # Clean up temp directory after successful rsync
-            shutil.rmtree(temp_deploy_dir)
-        
+        transfer_to_remote(source_dirs, remote_host, remote_path, args.ssh_opts, args.checksum)
         UI.print_success(f"Deployed {deployed_count} files to {args.remote}")
     elif deployed_count > 0:
         UI.print_success(f"Deployed {deployed_count} files to {dest_dir}")
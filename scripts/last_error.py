@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 from pathlib import Path
 
@@ -7,6 +8,65 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from yocto_utils import UI, get_bitbake_yocto_dir
 
+def iter_task_logs(search_dir):
+    """
+    Yield (path, mtime) for every temp/log.do_* file under search_dir.
+    A directory with a temp/ child is a recipe work directory, so only its temp/
+    is scanned and the walk never descends into sources, sysroots or package trees.
+    """
+    stack = [str(search_dir)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                subdirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            continue
+        
+        temp_dir = os.path.join(current, "temp")
+        if temp_dir not in subdirs:
+            stack.extend(subdirs)
+            continue
+        
+        try:
+            with os.scandir(temp_dir) as logs:
+                candidates = [e for e in logs if e.name.startswith("log.do_")]
+        except OSError:
+            continue
+        
+        for entry in candidates:
+            # log.do_* are symlinks to the per-run log; is_file() and stat() follow them.
+            # A log can vanish or be unreadable mid-walk; skip it like the glob did.
+            try:
+                if not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            yield entry.path, mtime
+
+# Task logs can reach hundreds of MB; errors are reported at the end, so only the tail is read
+LOG_TAIL_BYTES = 2 * 1024 * 1024
+
+# "error:" in any case (covers "ERROR:") or a case-sensitive "FAILED"
+ERROR_LINE_RE = re.compile(r"(?i:error:)|FAILED")
+
+def read_log_tail(path, size=LOG_TAIL_BYTES):
+    """
+    Return the lines in the last `size` bytes of a file.
+    A line cut off at the start of the window is dropped.
+    """
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        start = max(0, end - size)
+        f.seek(start)
+        data = f.read()
+    
+    lines = data.decode(errors="replace").splitlines()
+    if start > 0 and lines:
+        lines.pop(0)
+    return lines
+
 def get_latest_log(workspace_root):
     bitbake_yocto_dir = get_bitbake_yocto_dir(workspace_root)
     build_tmp_work = bitbake_yocto_dir / "build" / "tmp" / "work"
@@ -26,11 +86,7 @@ def get_latest_log(workspace_root):
         ]
         
         for search_dir in search_dirs:
-            if search_dir.exists():
-                for log_path in search_dir.glob("**/temp/log.do_*"):
-                    # We only care about real files, not symlinks (unless they point to real files)
-                    if log_path.is_file():
-                        log_files.append(log_path)
+            log_files.extend(iter_task_logs(search_dir))
     except Exception as e:
         UI.print_error(f"Error searching for logs: {e}", fatal=True)
 
@@ -38,8 +94,8 @@ def get_latest_log(workspace_root):
         UI.print_item("Status", "No task logs found.")
         sys.exit(0)
 
-    # Find the latest log by modification time
-    latest_log = max(log_files, key=lambda p: p.stat().st_mtime)
+    # Find the latest log by modification time (already stat'ed during the walk)
+    latest_log = Path(max(log_files, key=lambda t: t[1])[0])
 
     UI.print_item("Latest Log", latest_log.name)
     UI.print_item("Path", str(latest_log))
@@ -60,22 +116,21 @@ def main():
     # Check for actual errors in the log
     has_error = False
     try:
-        with open(latest_log, "r") as f:
-            lines = f.readlines()
-            # Yocto logs usually have "ERROR:" or "FAILED" at the end of the line
-            error_lines = [line for line in lines if "ERROR:" in line or "error:" in line.lower() or "FAILED" in line]
-            
-            if error_lines:
-                has_error = True
-                print(f"{UI.RED}{UI.BOLD}Detected Error Snippet:{UI.NC}")
-                # Show up to 15 lines around the first error or the last few lines
-                for line in error_lines[-10:]:
-                    print(line.strip())
-            else:
-                print(f"{UI.BOLD}No obvious error markers in the latest log. End of file:{UI.NC}")
-                # Sometimes the error is at the end of the log without a specific marker
-                for line in lines[-20:]:
-                    print(line.strip())
+        lines = read_log_tail(latest_log)
+        # Yocto logs usually have "ERROR:" or "FAILED" at the end of the line
+        error_lines = [line for line in lines if ERROR_LINE_RE.search(line)]
+        
+        if error_lines:
+            has_error = True
+            print(f"{UI.RED}{UI.BOLD}Detected Error Snippet:{UI.NC}")
+            # Show up to 15 lines around the first error or the last few lines
+            for line in error_lines[-10:]:
+                print(line.strip())
+        else:
+            print(f"{UI.BOLD}No obvious error markers in the latest log. End of file:{UI.NC}")
+            # Sometimes the error is at the end of the log without a specific marker
+            for line in lines[-20:]:
+                print(line.strip())
     except Exception as e:
         UI.print_error(f"Could not read log file: {e}")
 
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import argparse
 import subprocess
 import shutil
 from pathlib import Path
-sys.path.insert(0, str(Path(__file__).resolve().parent))
 from yocto_utils import (
     get_cached_layer,
     set_cached_layer,
@@ -15,9 +15,18 @@ from yocto_utils import (
     run_command,
     UI,
     get_bitbake_yocto_dir,
-    get_yocto_branch
+    get_yocto_branch,
+    sanitize_yocto_name
 )
 
+# A BBLAYERS assignment in bblayers.conf, e.g. BBLAYERS ?= "..." or BBLAYERS:append = " ..."
+BBLAYERS_ASSIGN_RE = re.compile(r'\s*BBLAYERS(:append|:prepend)?\s*(\?\?=|\?=|:=|\+=|=\+|\.=|=)\s*"([^"]*)"\s*')
+# Any other statement that could change BBLAYERS (overrides, includes, ...)
+BBLAYERS_OTHER_RE = re.compile(r'\s*(?:(?:export\s+)?BBLAYERS\b(?!_)|include\s|require\s|inherit\s)')
+
+# A layer row of 'bitbake-layers show-layers': name, absolute path, priority
+SHOW_LAYERS_PATH_RE = re.compile(r'\s*\S+\s+(/\S*)\s+\d')
+
 def main():
     parser = argparse.ArgumentParser(description="Manage local Yocto layers")
     parser.add_argument("--list", action="store_true", help="List active and available layers")
@@ -26,6 +35,7 @@ def main():
     parser.add_argument("--recipes", nargs="?", const="", metavar="LAYER", help="List all recipes in a layer (auto-detect if not specified)")
     parser.add_argument("--interactive", action="store_true", help="Force interactive layer selection")
     parser.add_argument("--no-cache", action="store_true", help="Ignore cached layer preference")
+    parser.add_argument("--show", action="store_true", help="Print the active layer table (bitbake-layers show-layers) after syncing")
     args = parser.parse_args()
 
     workspace_root = Path(__file__).resolve().parent.parent
@@ -53,7 +63,7 @@ def main():
 
     health_check(layers_base)
     prune_missing_layers(workspace_root)
-    sync_layers(workspace_root, layers_base)
+    sync_layers(workspace_root, layers_base, show_summary=args.show)
 
 def health_check(layers_base: Path):
     """
@@ -154,21 +164,35 @@ def get_layer_for_command(workspace_root, layer_arg, interactive, no_cache):
         UI.print_item("Auto-detected", all_layers[0].name)
         return all_layers[0]
 
+def scan_layer_recipes(layer_path):
+    """
+    Collect the recipes of a layer (recipes-<category>/<dir>/<name>.bb) with os.scandir.
+    
+    Returns a dict of category -> sorted recipe names; categories without recipes are left out.
+    """
+    with os.scandir(layer_path) as entries:
+        recipe_dirs = sorted((e.name, e.path) for e in entries if e.name.startswith("recipes-") and e.is_dir())
+    
+    categories = {}
+    for dir_name, dir_path in recipe_dirs:
+        recipes = []
+        with os.scandir(dir_path) as packages:
+            for pkg in packages:
+                if pkg.name.startswith(".") or not pkg.is_dir():
+                    continue
+                with os.scandir(pkg.path) as files:
+                    recipes.extend((pkg.name, f.name[:-3]) for f in files if f.name.endswith(".bb") and not f.name.startswith("."))
+        if recipes:
+            categories[dir_name.replace("recipes-", "")] = [name for _, name in sorted(recipes)]
+    return categories
+
 def show_layer_info(layer_path):
     """Show detailed information about a layer."""
     UI.print_item("Layer Name", layer_path.name)
     UI.print_item("Path", str(layer_path))
     
-    recipe_dirs = {}
-    total_recipes = 0
-    
-    for recipes_dir in layer_path.glob("recipes-*"):
-        if recipes_dir.is_dir():
-            category = recipes_dir.name.replace("recipes-", "")
-            count = len(list(recipes_dir.glob("*/*.bb")))
-            if count > 0:
-                recipe_dirs[category] = count
-                total_recipes += count
+    recipe_dirs = {category: len(recipes) for category, recipes in scan_layer_recipes(layer_path).items()}
+    total_recipes = sum(recipe_dirs.values())
     
     UI.print_item("Total Recipes", str(total_recipes))
     
@@ -187,77 +211,145 @@ def list_layer_recipes(layer_path):
     """List all recipes in a layer."""
     UI.print_item("Layer", layer_path.name)
     
-    recipes_found = False
+    categories = scan_layer_recipes(layer_path)
     
-    for recipes_dir in sorted(layer_path.glob("recipes-*")):
-        if recipes_dir.is_dir():
-            category = recipes_dir.name.replace("recipes-", "")
-            recipes = list(recipes_dir.glob("*/*.bb"))
-            
-            if recipes:
-                recipes_found = True
-                print(f"\n  {UI.BOLD}{category}:{UI.NC}")
-                for recipe in sorted(recipes):
-                    recipe_name = recipe.stem
-                    print(f"    {UI.GREEN}{recipe_name}{UI.NC}")
+    for category, recipes in categories.items():
+        print(f"\n  {UI.BOLD}{category}:{UI.NC}")
+        for recipe_name in recipes:
+            print(f"    {UI.GREEN}{recipe_name}{UI.NC}")
     
-    if not recipes_found:
+    if not categories:
         UI.print_warning("No recipes found in this layer.")
 
-def sync_layers(workspace_root, layers_base):
-    local_layers = [d for d in layers_base.iterdir() if d.is_dir() and d.name.startswith("meta-")]
-    
-    # Also check sources for layers (cloned by yocto-machine)
-    sources_dir = workspace_root / "yocto" / "sources"
-    if sources_dir.exists():
-        for d in sources_dir.iterdir():
-            if d.is_dir() and d.name.startswith("meta-"):
-                local_layers.append(d)
-    UI.print_item("Available", f"{len(local_layers)} local layers found")
-    
-    check_layers = run_command("bitbake-layers show-layers")
-    
-    if "ERROR: The BBPATH variable is not set" in check_layers:
+def report_bitbake_errors(output):
+    """
+    Print guidance for known BitBake environment problems in command output.
+    Returns True if one was found and the caller should stop.
+    """
+    if "ERROR: The BBPATH variable is not set" in output:
         UI.print_error("BitBake environment not detected.")
         print(f"  Please source the environment first (e.g., 'source scripts/env_init.sh')")
-        return
-
-
+        return True
 
     # Check for specific configuration conflict (MACHINE set in local.conf + fragment enabled)
-    if "is used while MACHINE has already got an assignment" in check_layers:
+    if "is used while MACHINE has already got an assignment" in output:
         UI.print_error("Configuration Conflict Detected")
         print("  The MACHINE is set in local.conf but a configuration fragment is also enabled.")
         print(f"\n  {UI.BOLD}To fix this, run:{UI.NC}")
         print(f"    {UI.GREEN}yocto-machine switch <machine-name>{UI.NC}")
         print("  (This will automatically resolve the conflict)")
-        return
+        return True
+
+    return False
+
+def get_active_layer_paths(build_dir):
+    """
+    Get the resolved paths of the layers listed in build_dir/conf/bblayers.conf.
+    Every BBLAYERS assignment (=, ?=, ??=, +=, :append, ...) is applied; relative
+    entries and ${TOPDIR} resolve against build_dir like BitBake does.
+    
+    Returns None if the file is missing or uses syntax that can't be evaluated
+    here, so the caller can ask bitbake-layers instead.
+    """
+    try:
+        content = (build_dir / "conf" / "bblayers.conf").read_text()
+    except OSError:
+        return None
+    
+    value = None
+    weak_default = None
+    appended = []
+    # Backslash-newline continues an assignment over several lines
+    for line in content.replace("\\\n", " ").splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = BBLAYERS_ASSIGN_RE.fullmatch(line)
+        if not match:
+            if BBLAYERS_OTHER_RE.match(line):
+                return None
+            continue
+        
+        suffix, op, raw = match.groups()
+        items = raw.replace("${TOPDIR}", str(build_dir)).split()
+        if any("$" in item for item in items):
+            return None
+        
+        if suffix:
+            appended += items
+        elif op in ("=", ":="):
+            value = items
+        elif op == "?=":
+            value = items if value is None else value
+        elif op == "??=":
+            weak_default = items
+        else:
+            value = (value or []) + items
+    
+    layers = (value if value is not None else weak_default or []) + appended
+    if not layers:
+        return None
+    return frozenset(os.path.realpath(os.path.join(build_dir, p)) for p in layers)
+
+def parse_show_layers_paths(output):
+    """
+    Get the resolved layer paths from 'bitbake-layers show-layers' output.
+    """
+    return frozenset(
+        os.path.realpath(match.group(1))
+        for match in map(SHOW_LAYERS_PATH_RE.match, output.splitlines())
+        if match
+    )
 
-    active_layers = check_layers.splitlines()
+def sync_layers(workspace_root, layers_base, show_summary=False):
+    local_layers = [d for d in layers_base.iterdir() if d.is_dir() and d.name.startswith("meta-")]
+    
+    # Also check sources for layers (cloned by yocto-machine)
+    sources_dir = workspace_root / "yocto" / "sources"
+    if sources_dir.exists():
+        for d in sources_dir.iterdir():
+            if d.is_dir() and d.name.startswith("meta-"):
+                local_layers.append(d)
+    UI.print_item("Available", f"{len(local_layers)} local layers found")
     
+    # bblayers.conf lists the active layers directly; bitbake-layers costs a full BitBake start
     build_dir = get_bitbake_yocto_dir(workspace_root) / "build"
+    active_paths = get_active_layer_paths(build_dir)
+    if active_paths is None:
+        check_layers = run_command(["bitbake-layers", "show-layers"])
+        if report_bitbake_errors(check_layers):
+            return
+        active_paths = parse_show_layers_paths(check_layers)
+    
+    to_add = []
     
     for layer_path in local_layers:
         try:
             layer_rel_path = os.path.relpath(layer_path, build_dir)
         except ValueError:
             layer_rel_path = str(layer_path.resolve())
-            
-        layer_abs_path = str(layer_path.resolve())
-        is_active = any(layer_abs_path in line for line in active_layers)
         
-        if is_active:
+        if os.path.realpath(layer_path) in active_paths:
             print(f"  Layer '{layer_path.name}' : {UI.GREEN}ACTIVE{UI.NC}")
         else:
-            print(f"  Adding layer '{layer_path.name}'...")
-            output = run_command(f"bitbake-layers add-layer {layer_rel_path}", cwd=build_dir)
-            if "ERROR" in output:
-                UI.print_error(f"Failed to add layer: {output.strip()}")
-            else:
-                UI.print_success(f"Added layer '{layer_path.name}'")
+            to_add.append((layer_path.name, layer_rel_path))
+
+    if to_add:
+        # add-layer accepts several layers, so BitBake only starts once
+        print(f"  Adding layers: {', '.join(name for name, _ in to_add)}...")
+        output = run_command(["bitbake-layers", "add-layer", *(path for _, path in to_add)], cwd=build_dir)
+        if report_bitbake_errors(output):
+            return
+        if "ERROR" in output:
+            UI.print_error(f"Failed to add layers: {output.strip()}")
+        else:
+            for name, _ in to_add:
+                UI.print_success(f"Added layer '{name}'")
+
+    if not show_summary:
+        return
 
     UI.print_header("Active Layer Configuration")
-    layers_summary = run_command("bitbake-layers show-layers")
+    layers_summary = run_command(["bitbake-layers", "show-layers"])
     
     # Skip the first few lines if they are just generic output, assume header starts with "layer"
     start_printing = False
@@ -269,8 +361,6 @@ def sync_layers(workspace_root, layers_base):
             print(f"    {line}")
 
 def scaffold_layer(name, layers_base, workspace_root):
-    from yocto_utils import sanitize_yocto_name
-    
     # Sanitize layer name (without meta- prefix first)
     if name.startswith("meta-"):
         core_name = name[5:]
@@ -8,7 +8,7 @@ from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI, find_custom_layer, get_yocto_branch, run_command, prune_machine_fragments, get_bitbake_yocto_dir, get_active_layers, check_branch_compatibility
+from yocto_utils import UI, find_custom_layer, get_yocto_branch, run_command, prune_machine_fragments, get_bitbake_yocto_dir, get_active_layers, check_branch_compatibility, get_available_machines, sanitize_yocto_name
 from yocto_layer_index import LayerIndex, DEFAULT_BRANCH
 
 WORKSPACE_ROOT = Path(__file__).resolve().parent.parent
@@ -209,7 +209,6 @@ def show_current_machine(local_conf):
 def list_machines(workspace_root, bitbake_yocto_dir):
     UI.print_item("Status", "Scanning for available machines...")
     
-    from yocto_utils import get_available_machines
     machines = get_available_machines(workspace_root)
 
     if machines['poky']:
@@ -297,7 +296,6 @@ def switch_machine(target_machine, local_conf):
     UI.print_success(f"Switched to {target_machine}")
 
 def scaffold_machine(name, workspace_root, layer_name):
-    from yocto_utils import sanitize_yocto_name
     name = sanitize_yocto_name(name, "machine")
     
     try:
@@ -4,7 +4,6 @@ import sys
 import argparse
 import subprocess
 from pathlib import Path
-sys.path.insert(0, str(Path(__file__).resolve().parent))
 from yocto_utils import (
     UI,
     find_built_images,
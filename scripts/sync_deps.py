@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
-import os
 import sys
 import re
 from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI, find_custom_layer, get_all_custom_layers, get_cached_layer
+SCRIPTS_DIR = Path(__file__).resolve().parent
+sys.path.append(str(SCRIPTS_DIR))
+from yocto_utils import UI, find_custom_layer, get_all_custom_layers, get_cached_layer, find_project_files, get_layer_recipe_index
+
+WORKSPACE_ROOT = SCRIPTS_DIR.parent
 
 # Special case mappings (only for packages that don't follow the lowercase convention)
 CMAKE_TO_YOCTO_MAP = {
@@ -18,44 +20,31 @@ CMAKE_TO_YOCTO_MAP = {
     "SQLite3": "sqlite3",
     "Threads": "",  # Built-in to toolchain
 }
+# Projects spell package names inconsistently (OpenSSL vs openssl), so match case-insensitively
+CMAKE_TO_YOCTO_MAP_CI = {k.casefold(): v for k, v in CMAKE_TO_YOCTO_MAP.items()}
+
+# Compiled once at import rather than on every detect_dependencies() call
+FIND_PACKAGE_RE = re.compile(r"find_package\s*\(\s*(\w+)", re.IGNORECASE)
 
 def detect_dependencies(project_dir, workspace_root, layer_dir=None):
-    deps = set()
-    cmake_lists = project_dir / "CMakeLists.txt"
-    if cmake_lists.exists():
-        with open(cmake_lists, "r") as f:
-            content = f.read()
-            
-            # Find common CMake find_package calls
-            matches = re.findall(r"find_package\s*\(\s*(\w+)", content, re.IGNORECASE)
-            for m in matches:
-                # Check if it's in the special case map
-                if m in CMAKE_TO_YOCTO_MAP:
-                    yocto_dep = CMAKE_TO_YOCTO_MAP[m]
-                    if yocto_dep:  # Skip empty strings (like Threads)
-                        deps.add(yocto_dep)
-                else:
-                    # Check if it's an internal dependency (another project in sw/)
-                    sw_dir = workspace_root / "sw"
-                    found = False
-                    for lang_dir in ["cpp", "rust", "go", "python", "module"]:
-                        if (sw_dir / lang_dir / m.lower()).exists():
-                            deps.add(m.lower())
-                            found = True
-                            break
-                    
-                    if not found:
-                        # Check if a recipe exists for this dependency in the layer
-                        if layer_dir:
-                            recipe_pattern = f"{m.lower()}_*.bb"
-                            if list(layer_dir.rglob(recipe_pattern)):
-                                deps.add(m.lower())
-                                found = True
-                        
-                        if not found:
-                            # Default: convert to lowercase (most packages follow this convention)
-                            deps.add(m.lower())
-    return sorted(list(filter(None, deps)))
+    # workspace_root and layer_dir are kept for callers; names resolve without filesystem lookups
+    try:
+        content = (project_dir / "CMakeLists.txt").read_text(errors="replace")
+    except OSError:
+        return []
+    # CMake commands are case-insensitive; skip the regex for files without any
+    if "find_package" not in content.lower():
+        return []
+    
+    # Find common CMake find_package calls, resolving each package name once
+    # even when it is looked up in several if() branches
+    names = {match.group(1).casefold() for match in FIND_PACKAGE_RE.finditer(content)}
+    # Special cases come from the map; internal projects (sw/<lang>/<name>),
+    # recipes in the layer and external packages all follow the lowercase
+    # naming convention, so everything else resolves to the name itself
+    deps = {CMAKE_TO_YOCTO_MAP_CI.get(name, name) for name in names}
+    deps.discard("")  # Built-in packages map to "" (like Threads)
+    return sorted(deps)
 
 def update_recipe(recipe_file, new_deps):
     if not recipe_file.exists():
@@ -99,8 +88,7 @@ def update_recipe(recipe_file, new_deps):
             updated = True
 
     if updated:
-        with open(recipe_file, "w") as f:
-            f.writelines(new_lines)
+        recipe_file.write_text("".join(new_lines))
         return True
     return False
 
@@ -110,15 +98,14 @@ def main():
     parser.add_argument("--layer", default=None, help="Layer name to use (default: auto-detect)")
     args = parser.parse_args()
 
-    workspace_root = Path(__file__).resolve().parent.parent
-    sw_dir = workspace_root / "sw"
+    sw_dir = WORKSPACE_ROOT / "sw"
     
     # Smart layer detection
     if args.layer:
-        layer_dir = find_custom_layer(workspace_root, args.layer)
+        layer_dir = find_custom_layer(WORKSPACE_ROOT, args.layer)
     else:
-        cached_layer = get_cached_layer(workspace_root)
-        all_layers = get_all_custom_layers(workspace_root)
+        cached_layer = get_cached_layer(WORKSPACE_ROOT)
+        all_layers = get_all_custom_layers(WORKSPACE_ROOT)
         
         if not all_layers:
             UI.print_error("No custom layers found.")
@@ -130,7 +117,7 @@ def main():
             layer_dir = all_layers[0]
         elif cached_layer:
             # Use cached layer
-            layer_dir = workspace_root / "yocto" / "layers" / cached_layer
+            layer_dir = WORKSPACE_ROOT / "yocto" / "layers" / cached_layer
         else:
             # Multiple layers, use first one
             layer_dir = all_layers[0]
@@ -139,23 +126,22 @@ def main():
     UI.print_item("Layer", layer_dir.name)
     
     updated_count = 0
+    # One walk of the layer; keys include every '_' prefix, so 'foo_bar' finds foo_bar_0.1.bb
+    recipe_index = get_layer_recipe_index(layer_dir)
     # Recursively scan all subdirectories in sw/ including language-specific folders
-    for project_dir in sw_dir.rglob("CMakeLists.txt"):
-        project_dir = project_dir.parent
+    # (a single pruned walk, skipping build output and VCS directories)
+    for cmake_lists in find_project_files(sw_dir, ["CMakeLists.txt"])["CMakeLists.txt"]:
+        project_dir = cmake_lists.parent
         # Get the project name relative to sw/ to handle nested structures
         rel_path = project_dir.relative_to(sw_dir)
         project_name = rel_path.name if len(rel_path.parts) == 1 else rel_path.parts[-1]
         
         # Find the recipe
-        recipe_file = None
-        for r in layer_dir.rglob(f"{project_name}_*.bb"):
-            recipe_file = r
-            break
-        
-        if not recipe_file:
+        if project_name not in recipe_index:
             continue
+        recipe_file = Path(recipe_index[project_name])
             
-        detected_deps = detect_dependencies(project_dir, workspace_root, layer_dir)
+        detected_deps = detect_dependencies(project_dir, WORKSPACE_ROOT, layer_dir)
         if update_recipe(recipe_file, detected_deps):
             print(f"  {UI.GREEN}[UPDATED]{UI.NC} {project_name:15} -> {', '.join(detected_deps)}")
             updated_count += 1
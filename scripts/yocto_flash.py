@@ -3,12 +3,13 @@ import sys
 import os
 import subprocess
 import argparse
+import json
 import shutil
 from pathlib import Path
 
 # Add scripts directory to path to import yocto_utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from yocto_utils import UI, find_built_images, get_machine_from_config
+from yocto_utils import UI, find_built_images, get_machine_from_config, select_image_interactive, get_cached_image
 
 def get_block_devices():
     """Return a list of block devices with their details."""
@@ -17,7 +18,6 @@ def get_block_devices():
         # lsblk -J -o NAME,SIZE,TYPE,MOUNTPOINT,MODEL
         cmd = ["lsblk", "-J", "-o", "NAME,SIZE,TYPE,MOUNTPOINT,MODEL,RM"]
         result = subprocess.run(cmd, capture_output=True, text=True)
-        import json
         data = json.loads(result.stdout)
         
         for device in data.get('blockdevices', []):
@@ -38,7 +38,6 @@ def is_safe_device(device_name):
     cmd = ["lsblk", "/dev/" + device_name, "-J", "-o", "NAME,MOUNTPOINT"]
     try:
         result = subprocess.run(cmd, capture_output=True, text=True)
-        import json
         data = json.loads(result.stdout)
         
         def check_mounts(node):
@@ -74,7 +73,6 @@ def main():
     if not args.image:
         # Interactive selection
         images = find_built_images(workspace_root, args.machine)
-        from yocto_utils import select_image_interactive, get_cached_image
         selected = select_image_interactive(workspace_root, images, get_cached_image(workspace_root), "flash")
         if not selected:
             sys.exit(1)
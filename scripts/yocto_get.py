@@ -5,7 +5,6 @@ import os
 import subprocess
 from pathlib import Path
 from packaging.version import parse as parse_version
-sys.path.insert(0, str(Path(__file__).resolve().parent))
 from yocto_layer_index import LayerIndex, DEFAULT_BRANCH
 from yocto_utils import (
     run_command as utils_run_command, 
@@ -19,7 +18,8 @@ from yocto_utils import (
     get_bitbake_yocto_dir,
     get_bblayers,
     get_active_layers,
-    check_branch_compatibility
+    check_branch_compatibility,
+    add_package_to_image
 )
 
 WORKSPACE_ROOT = Path(__file__).resolve().parent.parent
@@ -172,7 +172,6 @@ def add_to_image(recipe_name, image_name):
     if not image_name:
         return
     UI.print_item("Adding to image", f"{recipe_name} -> {image_name}")
-    from yocto_utils import add_package_to_image
     if add_package_to_image(WORKSPACE_ROOT, image_name, recipe_name):
         UI.print_success(f"Updated {image_name}")
     else:
@@ -217,6 +216,7 @@ def main():
     parser.add_argument("recipe", help="Recipe name to fetch")
     parser.add_argument("--image", help="Target image to add recipe to")
     parser.add_argument("--branch", default=default_branch, help=f"Yocto Branch (default: {default_branch})")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk Layer Index response cache")
     args = parser.parse_args()
 
     UI.print_header("Yocto Recipe Installer")
@@ -227,7 +227,7 @@ def main():
 
     # 1. Search
     UI.print_item("Searching", f"'{args.recipe}' in branch '{args.branch}'...")
-    index = LayerIndex(branch=args.branch)
+    index = LayerIndex(branch=args.branch, use_cache=not args.no_cache)
     if not index.get_branch_id():
         UI.print_error(f"Invalid branch '{args.branch}'", fatal=True)
         
@@ -238,20 +238,8 @@ def main():
     # Filter for exact matches first
     exact_matches = [r for r in recipes if r['pn'] == args.recipe]
     
-    potential_candidates = []
-    
-    if exact_matches:
-        # Resolve info for all exact matches
-        for r in exact_matches:
-            info = index.get_recipe_layer_info(r)
-            if info:
-                 potential_candidates.append(info)
-    elif recipes:
-        # Fallback to fuzzy matches if no exact match
-         for r in recipes:
-            info = index.get_recipe_layer_info(r)
-            if info:
-                potential_candidates.append(info)
+    # Resolve info for all exact matches, falling back to fuzzy matches if there are none
+    potential_candidates = index.resolve_recipes(exact_matches or recipes)
 
     if potential_candidates:
         # Sort by version (newest first)
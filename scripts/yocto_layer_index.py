@@ -1,46 +1,189 @@
 #!/usr/bin/env python3
+import gzip
+import hashlib
+import http.client
 import json
-import urllib.request
+import os
+import sqlite3
+import threading
+import time
 import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import List, Dict, Optional, Any
 import sys
 
 LAYER_INDEX_API_URL = "http://layers.openembedded.org/layerindex/api"
 DEFAULT_BRANCH = "master"
 
+# Responses are cached on disk so repeated searches don't hit the network.
+# Override the lifetime (in seconds) with YOCTO_CACHE_TTL; 0 disables the cache.
+CACHE_DB = Path(__file__).resolve().parent.parent / ".yocto-cache" / "layerindex.sqlite"
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60  # 1 week
+MAX_WORKERS = 16
+
+REQUEST_HEADERS = {'User-Agent': 'yocto-search/1.0', 'Accept-Encoding': 'gzip'}
+REQUEST_TIMEOUT = 30
+MAX_REDIRECTS = 5
+
+def get_cache_ttl() -> int:
+    """Return the response cache lifetime from YOCTO_CACHE_TTL (seconds)."""
+    try:
+        return int(os.environ.get("YOCTO_CACHE_TTL", DEFAULT_CACHE_TTL))
+    except ValueError:
+        return DEFAULT_CACHE_TTL
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of Layer Index API responses, keyed by request URL.
+    Failures are silently ignored - the cache is an optimisation only.
+    """
+    def __init__(self, path: Path = CACHE_DB, ttl: int = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._conn = None
+        # The connection is shared between worker threads, so serialise access
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache(key BLOB PRIMARY KEY, ts INTEGER, body BLOB)")
+        return self._conn
+
+    @staticmethod
+    def _key(url: str) -> bytes:
+        return hashlib.blake2b(url.encode(), digest_size=16).digest()
+
+    def get(self, url: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT ts, body FROM cache WHERE key = ?", (self._key(url),)
+                ).fetchone()
+            if row and time.time() - row[0] < self.ttl:
+                return json.loads(zlib.decompress(row[1]))
+        except (sqlite3.Error, OSError, zlib.error, ValueError):
+            pass
+        return None
+
+    def put(self, url: str, result: List[Dict[str, Any]]):
+        try:
+            body = zlib.compress(json.dumps(result).encode())
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache(key, ts, body) VALUES (?, ?, ?)",
+                    (self._key(url), int(time.time()), body)
+                )
+        except (sqlite3.Error, OSError):
+            pass
+
 class LayerIndex:
-    def __init__(self, branch: str = DEFAULT_BRANCH):
+    def __init__(self, branch: str = DEFAULT_BRANCH, use_cache: bool = True):
         self.branch = branch
         self._branch_id = None
+        self._branch_id_fetched = False
+        self._search_cache = {}       # (endpoint, keyword) -> results
         self._layerbranch_cache = {}  # id -> lb_info
         self._layer_cache = {}        # id -> layer_info
         self._prefetched_branches = False
+        self._prefetched_layers = False
+        
+        ttl = get_cache_ttl()
+        self._response_cache = ResponseCache(ttl=ttl) if use_cache and ttl > 0 else None
+        
+        # Keep-alive connections, one set per thread (http.client is not thread-safe)
+        self._local = threading.local()
+        
+    def _get_connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Return this thread's persistent connection to the given host, creating it if needed."""
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+            
+        conn = connections.get((scheme, netloc))
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = connections[(scheme, netloc)] = conn_class(netloc, timeout=REQUEST_TIMEOUT)
+        return conn
+
+    def _fetch(self, url: str, redirects: int = MAX_REDIRECTS) -> Optional[bytes]:
+        """GET a URL over a reused connection, following redirects. Returns the body or None."""
+        parts = urllib.parse.urlsplit(url)
+        path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        conn = self._get_connection(parts.scheme, parts.netloc)
+        
+        try:
+            conn.request("GET", path, headers=REQUEST_HEADERS)
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # The server closed the idle keep-alive connection; retry once on a fresh one.
+            # Timeouts and other failures are not retried, so a dead server costs one timeout.
+            conn.close()
+            conn.request("GET", path, headers=REQUEST_HEADERS)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Leave no half-used connection behind for the next request on this thread
+            conn.close()
+            raise
+            
+        # Always drain the body so the connection can be reused
+        body = response.read()
+        
+        location = response.getheader("Location")
+        if response.status in (301, 302, 303, 307, 308) and location and redirects > 0:
+            return self._fetch(urllib.parse.urljoin(url, location), redirects - 1)
+        if response.status != 200:
+            return None
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
         
     def _make_request(self, endpoint: str, params: Dict[str, str] = None) -> List[Dict[str, Any]]:
-        """Helper to make GET requests to the Layer Index API."""
+        """Helper to make GET requests to the Layer Index API (served from the disk cache when possible)."""
         url = f"{LAYER_INDEX_API_URL}/{endpoint}/"
         if params:
-            query_string = urllib.parse.urlencode(params)
+            # Sort so equivalent queries share a cache entry
+            query_string = urllib.parse.urlencode(sorted(params.items()))
             url = f"{url}?{query_string}"
         
+        if self._response_cache:
+            cached = self._response_cache.get(url)
+            if cached is not None:
+                return cached
+        
         try:
-            req = urllib.request.Request(url, headers={'User-Agent': 'yocto-search/1.0'})
-            with urllib.request.urlopen(req) as response:
-                if response.status == 200:
-                    return json.loads(response.read().decode())
+            body = self._fetch(url)
+            if body is None:
                 return []
+            result = json.loads(body.decode())
+            # Empty results are not cached: an unknown branch or a layer that is not
+            # indexed yet would otherwise hide real data for the whole TTL
+            if self._response_cache and result:
+                self._response_cache.put(url, result)
+            return result
         except Exception as e:
             return []
 
     def get_branch_id(self) -> Optional[int]:
-        if self._branch_id:
+        # Memoized, including a "not found" answer, for the lifetime of this instance
+        if self._branch_id_fetched:
             return self._branch_id
         
         results = self._make_request("branches", {"filter": f"name:{self.branch}"})
         if results:
             self._branch_id = results[0]['id']
-            return self._branch_id
-        return None
+        self._branch_id_fetched = True
+        return self._branch_id
+
+    def _search(self, endpoint: str, field: str, keyword: str) -> List[Dict[str, Any]]:
+        """Run a name search, memoized per keyword. Returns a copy callers may modify."""
+        key = (endpoint, keyword)
+        if key not in self._search_cache:
+            self._search_cache[key] = self._make_request(endpoint, {"filter": f"{field}__icontains:{keyword}"})
+        return list(self._search_cache[key])
 
     def prefetch_layerbranches(self):
         """Fetch all layerbranches for the current branch to speed up filtering."""
@@ -61,7 +204,7 @@ class LayerIndex:
         Search for recipes by name (exact or substring).
         Returns a list of recipes. Note: DOES NOT filter by branch yet.
         """
-        return self._make_request("recipes", {"filter": f"pn__icontains:{keyword}"})
+        return self._search("recipes", "pn", keyword)
 
     def get_layerbranch(self, layerbranch_id: int) -> Optional[Dict[str, Any]]:
         if layerbranch_id in self._layerbranch_cache:
@@ -99,6 +242,28 @@ class LayerIndex:
             return results[0]
         return None
 
+    def prefetch_layer_items(self):
+        """Fetch all layer items in a single request to avoid per-layer lookups."""
+        if self._prefetched_layers:
+            return
+            
+        for layer in self._make_request("layerItems"):
+            self._layer_cache[layer['id']] = layer
+        self._prefetched_layers = True
+
+    def get_layer_items(self, layer_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Resolve several layer ids at once.
+        Returns a dict of layer_id -> layer_info for the ids that were found.
+        """
+        missing = [i for i in layer_ids if i not in self._layer_cache]
+        if len(missing) > 1:
+            self.prefetch_layer_items()
+        elif missing:
+            self.get_layer_item(missing[0])
+            
+        return {i: self._layer_cache[i] for i in layer_ids if i in self._layer_cache}
+
     def get_layer_dependencies(self, layer_id: int) -> List[Dict[str, Any]]:
         """
         Get dependencies for a layer in the current branch.
@@ -122,15 +287,10 @@ class LayerIndex:
         # 2. Get dependencies
         deps = self._make_request("layerDependencies", {"filter": f"layerbranch:{target_lb['id']}"})
         
-        # 3. Resolve to layer items
-        dep_layers = []
-        for d in deps:
-            dep_layer_id = d['dependency']
-            l = self.get_layer_item(dep_layer_id)
-            if l:
-                dep_layers.append(l)
-                
-        return dep_layers
+        # 3. Resolve to layer items (one request for all dependencies)
+        dep_ids = [d['dependency'] for d in deps]
+        layers = self.get_layer_items(dep_ids)
+        return [layers[i] for i in dep_ids if i in layers]
     
     def get_recipe_layer_info(self, recipe: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -172,8 +332,21 @@ class LayerIndex:
             "layer_index_url": layer.get('vcs_web_url', '') # redundant but for compatibility
         }
 
+    def resolve_recipes(self, recipes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Resolve layer info for many recipes concurrently.
+        Returns the combined info dicts for recipes valid on the target branch, in input order.
+        """
+        # Warm the shared caches first so the workers don't all prefetch at once
+        self.get_branch_id()
+        self.prefetch_layerbranches()
+        
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            infos = pool.map(self.get_recipe_layer_info, recipes)
+            return [info for info in infos if info]
+
     def search_layers(self, keyword: str) -> List[Dict[str, Any]]:
-        return self._make_request("layerItems", {"filter": f"name__icontains:{keyword}"})
+        return self._search("layerItems", "name", keyword)
 
     def search_machines(self, keyword: str) -> List[Dict[str, Any]]:
         """
@@ -181,7 +354,7 @@ class LayerIndex:
         """
         # Search machines triggers the need for filtering, so prefetch branches
         self.prefetch_layerbranches()
-        return self._make_request("machines", {"filter": f"name__icontains:{keyword}"})
+        return self._search("machines", "name", keyword)
 
     def get_machine_layer_info(self, machine: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
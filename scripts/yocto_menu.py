@@ -1280,12 +1280,10 @@ class YoctoMenuApp:
         # Exact match first
         recipes.sort(key=lambda x: (x['pn'] != term, x['pn']))
 
-        for r in recipes[:30]: # Limit results
-             info = index.get_recipe_layer_info(r)
-             if info:
-                 label = f"{info['recipe_name']} ({info['layer_name']})"
-                 desc = info.get('summary', '')[:60]
-                 items.append(MenuItem(label, lambda r=r['pn']: self._perform_get_recipe(r), desc))
+        for info in index.resolve_recipes(recipes[:30]): # Limit results
+             label = f"{info['recipe_name']} ({info['layer_name']})"
+             desc = info.get('summary', '')[:60]
+             items.append(MenuItem(label, lambda r=info['recipe_name']: self._perform_get_recipe(r), desc))
 
         menu = Menu(f"Search Results: '{term}'", items)
         self.enter_menu(menu)
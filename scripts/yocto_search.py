@@ -3,7 +3,6 @@ import argparse
 import sys
 from pathlib import Path
 from packaging.version import parse as parse_version
-sys.path.insert(0, str(Path(__file__).resolve().parent))
 from yocto_layer_index import LayerIndex, DEFAULT_BRANCH
 try:
     from yocto_utils import get_yocto_branch, UI
@@ -24,13 +23,14 @@ def main():
     parser.add_argument("term", help="Search term (recipe name)")
     parser.add_argument("--branch", default=default_branch, help=f"Yocto branch to search (default: {default_branch})")
     parser.add_argument("--limit", type=int, default=10, help="Limit number of results")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk Layer Index response cache")
     args = parser.parse_args()
 
     UI.print_header("Yocto Recipe Search")
     UI.print_item("Search Term", args.term)
     UI.print_item("Branch", args.branch)
 
-    index = LayerIndex(branch=args.branch)
+    index = LayerIndex(branch=args.branch, use_cache=not args.no_cache)
     # Ensure branch ID is valid
     if not index.get_branch_id():
         UI.print_error(f"Branch '{args.branch}' not found in Layer Index.", fatal=True)
@@ -42,14 +42,9 @@ def main():
         sys.exit(0)
 
     # Filter and resolve details
-    results = []
     UI.print_item("Matches", str(len(recipes)))
     
-    count = 0
-    for r in recipes:
-        info = index.get_recipe_layer_info(r)
-        if info:
-            results.append(info)
+    results = index.resolve_recipes(recipes)
     
     if not results:
         UI.print_error(f"No recipes found for branch '{args.branch}' matching '{args.term}'.")
@@ -4,7 +4,9 @@ Helper utilities for Yocto workspace scripts.
 Provides common functions like finding the custom layer automatically.
 """
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import os
 import re
 import subprocess
 import sys
@@ -37,8 +39,8 @@ class UI:
     DIM = '\033[2m'
     NC = '\033[0m' # No Color
     
-    # Handle environment without color
-    if not sys.stdout.isatty():
+    # Handle environment without color (pipes, CI logs, or NO_COLOR set per no-color.org)
+    if not sys.stdout.isatty() or os.environ.get("NO_COLOR"):
         BOLD = CYAN = GREEN = RED = YELLOW = DIM = NC = ''
 
     @classmethod
@@ -98,38 +100,125 @@ def sanitize_yocto_name(name: str, context: str = "item") -> str:
 
 
 def run_command(cmd, cwd=None):
+    """
+    Run a command and return its stripped stdout.
+    
+    Pass an argv list to exec the program directly; a plain string is still
+    run through the shell for callers that need shell syntax.
+    """
     try:
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True, cwd=cwd)
+        result = subprocess.run(cmd, shell=isinstance(cmd, str), check=True, capture_output=True, text=True, cwd=cwd)
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         # Return error details so caller can handle or display them
         return f"ERROR: {e}\nOutput: {e.stdout}\nError: {e.stderr}"
+    except OSError as e:
+        # Executable not found (only possible without a shell)
+        return f"ERROR: {e}"
+
+def stream_command(cmd, cwd=None, **kwargs):
+    """
+    Run a command and yield its stdout line by line as it is produced,
+    so callers can parse output while the command is still running.
+    
+    stderr is discarded. Raises subprocess.CalledProcessError once the
+    output is exhausted if the command failed. If the caller stops
+    iterating early, the command is terminated rather than waited for.
+    """
+    with subprocess.Popen(cmd, shell=isinstance(cmd, str), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          text=True, bufsize=1, cwd=cwd, **kwargs) as proc:
+        try:
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+        except GeneratorExit:
+            proc.terminate()
+            raise
+    
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+# Directories that never contain project sources (VCS metadata, build output, vendored deps)
+SKIP_SCAN_DIRS = frozenset({".git", "build", "target", "node_modules", "__pycache__"})
+
+def find_project_files(root: Path, filenames: Iterable[str]) -> Dict[str, List[Path]]:
+    """
+    Walk a source tree once and collect files with the given names.
+    Build output, VCS metadata and dependency directories are pruned from the walk.
+    
+    Returns a dict of filename -> list of matching paths (empty list if none found).
+    """
+    wanted = frozenset(filenames)
+    found = {name: [] for name in wanted}
+    
+    for dirpath, dirnames, files in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_SCAN_DIRS]
+        for name in wanted.intersection(files):
+            found[name].append(Path(dirpath) / name)
+            
+    return found
+
+def get_layer_recipe_index(layer_dir: Path) -> Dict[str, str]:
+    """
+    Walk a layer once and map the name prefixes of its .bb recipes to a recipe file path.
+    A recipe 'foo_bar_1.0.bb' is indexed under 'foo' and 'foo_bar', so `index.get(name)`
+    finds a file matching layer_dir.rglob(f"{name}_*.bb"). Hidden directories are skipped.
+    """
+    index = {}
+    for dirpath, dirnames, files in os.walk(layer_dir):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in files:
+            if name.endswith(".bb"):
+                path = os.path.join(dirpath, name)
+                parts = name[:-3].split("_")
+                for i in range(1, len(parts)):
+                    index.setdefault("_".join(parts[:i]), path)
+    return index
+
+def get_layer_recipe_prefixes(layer_dir: Path) -> Set[str]:
+    """
+    Collect the name prefixes of a layer's .bb recipes (see get_layer_recipe_index),
+    so `name in prefixes` matches the same files as layer_dir.rglob(f"{name}_*.bb").
+    """
+    return set(get_layer_recipe_index(layer_dir))
+
+# layers_dir -> (mtime_ns of layers_dir, sorted candidate meta-* directories)
+CUSTOM_LAYERS_CACHE: Dict[Path, Tuple[int, List[Path]]] = {}
 
 def get_all_custom_layers(workspace_root: Path) -> List[Path]:
     """
     Get all custom layers in the workspace.
     Looks for layers in yocto/layers/ that are not standard Poky layers.
     
+    The directory listing is memoized per process and redone when yocto/layers/
+    changes (a layer is added or removed). layer.conf lives two levels down and
+    does not touch that mtime, so it is checked on every call.
+    
     Returns a list of custom layer paths (excluding meta-skeleton).
     """
     layers_dir = workspace_root / "yocto" / "layers"
     
-    if not layers_dir.exists():
+    try:
+        mtime = layers_dir.stat().st_mtime_ns
+    except OSError:
         return []
     
-    # Standard/template layers to skip
-    skip_layers = {"meta-skeleton", "meta-poky", "meta-yocto-bsp"}
-    
-    # Find all meta-* directories
-    custom_layers = []
-    for layer_path in layers_dir.iterdir():
-        if layer_path.is_dir() and layer_path.name.startswith("meta-"):
-            if layer_path.name not in skip_layers:
-                # Verify it has a layer.conf to be valid
-                if (layer_path / "conf" / "layer.conf").exists():
-                    custom_layers.append(layer_path)
+    cached = CUSTOM_LAYERS_CACHE.get(layers_dir)
+    if cached and cached[0] == mtime:
+        candidates = cached[1]
+    else:
+        # Standard/template layers to skip
+        skip_layers = {"meta-skeleton", "meta-poky", "meta-yocto-bsp"}
+        
+        # Find all meta-* directories
+        candidates = sorted(
+            (p for p in layers_dir.iterdir()
+             if p.is_dir() and p.name.startswith("meta-") and p.name not in skip_layers),
+            key=lambda p: p.name,
+        )
+        CUSTOM_LAYERS_CACHE[layers_dir] = (mtime, candidates)
     
-    return sorted(custom_layers, key=lambda p: p.name)
+    # Verify each has a layer.conf to be valid (it may be added or removed at any time)
+    return [p for p in candidates if (p / "conf" / "layer.conf").exists()]
 
 def find_custom_layer(workspace_root: Path, layer_name: Optional[str] = None) -> Path:
     """
@@ -172,11 +261,6 @@ def find_custom_layer(workspace_root: Path, layer_name: Optional[str] = None) ->
     raise RuntimeError(
         f"Layer '{layer_name}' not found. Available custom layers: {', '.join(available)}"
     )
-    # Layer not found
-    available = [l.name for l in custom_layers]
-    raise RuntimeError(
-        f"Layer '{layer_name}' not found. Available custom layers: {', '.join(available)}"
-    )
 
 def get_available_machines(workspace_root: Path) -> dict:
     """
@@ -258,19 +342,11 @@ def scan_all_recipes(workspace_root: Path) -> List[str]:
         # We rely on run_command but we need to source env first.
         # Note: This might be slow (5-10s).
         
-        # We use a shell command with verify=False to avoid crashing if it fails
         # USE /bin/bash explicitly to support 'source'
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=workspace_root, executable="/bin/bash")
-        
-        if result.returncode != 0:
-            # Fallback to manual scan if bitbake fails (e.g. parsing error)
-            UI.print_warning("bitbake-layers failed, falling back to manual scan.")
-            return _scan_all_recipes_manual(workspace_root)
-            
-        output = result.stdout
+        # The output is large, so parse it line by line as it streams in
         recipes = set()
         
-        for line in output.splitlines():
+        for line in stream_command(cmd, cwd=workspace_root, executable="/bin/bash"):
             # Output format:
             # recipe-name:
             #   layer-name       version
@@ -282,6 +358,10 @@ def scan_all_recipes(workspace_root: Path) -> List[str]:
                      
         return sorted(list(recipes))
         
+    except subprocess.CalledProcessError:
+        # Fallback to manual scan if bitbake fails (e.g. parsing error)
+        UI.print_warning("bitbake-layers failed, falling back to manual scan.")
+        return _scan_all_recipes_manual(workspace_root)
     except Exception as e:
         UI.print_warning(f"Error scanning recipes: {e}")
         return _scan_all_recipes_manual(workspace_root)
@@ -451,9 +531,7 @@ def get_cached_image(workspace_root: Path) -> Optional[str]:
     """
     cache_file = workspace_root / ".yocto-cache" / "last-image"
     
-    if not cache_file.exists():
-        return None
-    
+    # A missing cache file is just another read failure; no separate exists() stat
     try:
         with open(cache_file, 'r') as f:
             return f.read().strip()
@@ -553,9 +631,7 @@ def get_cached_layer(workspace_root: Path) -> Optional[str]:
     """
     cache_file = workspace_root / ".yocto-cache" / "last-layer"
     
-    if not cache_file.exists():
-        return None
-    
+    # A missing cache file is just another read failure; no separate exists() stat
     try:
         with open(cache_file, 'r') as f:
             return f.read().strip()
@@ -809,6 +885,56 @@ def get_yocto_branch(workspace_root: Path) -> str:
         
     return "master"
 
+# A layer row of 'bitbake-layers show-layers': name followed by at least one more
+# column, excluding the header row and log lines
+SHOW_LAYERS_ROW_RE = re.compile(r'\s*(?!(?:layer|NOTE:|WARNING:|ERROR:)\s)(\S+)\s+\S')
+
+def get_show_layers_cache_file(workspace_root: Path, build_dir: Path) -> Optional[Path]:
+    """
+    Get the cache file for 'bitbake-layers show-layers' output.
+    The key changes whenever bblayers.conf is modified, so stale output is never reused.
+    
+    Returns None if bblayers.conf does not exist.
+    """
+    try:
+        mtime = (build_dir / "conf" / "bblayers.conf").stat().st_mtime_ns
+    except OSError:
+        return None
+    
+    key = hashlib.sha256(f"{build_dir}:{mtime}".encode()).hexdigest()
+    return workspace_root / ".yocto-cache" / "show-layers" / f"{key}.txt"
+
+def get_cached_show_layers(workspace_root: Path, build_dir: Path) -> Optional[str]:
+    """
+    Read cached 'bitbake-layers show-layers' output.
+    
+    Returns the output or None if there is no valid cache entry.
+    """
+    cache_file = get_show_layers_cache_file(workspace_root, build_dir)
+    if not cache_file or not cache_file.exists():
+        return None
+    
+    try:
+        return cache_file.read_text()
+    except Exception:
+        return None
+
+def set_cached_show_layers(workspace_root: Path, build_dir: Path, output: str):
+    """
+    Save 'bitbake-layers show-layers' output to cache, replacing older entries.
+    """
+    cache_file = get_show_layers_cache_file(workspace_root, build_dir)
+    if not cache_file:
+        return
+    
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        for old in cache_file.parent.glob("*.txt"):
+            old.unlink()
+        cache_file.write_text(output)
+    except Exception:
+        pass  # Silently fail if we can't write cache
+
 def get_active_layers(workspace_root: Path) -> List[str]:
     """
     Get names of currently active layers.
@@ -817,20 +943,32 @@ def get_active_layers(workspace_root: Path) -> List[str]:
     build_dir = bitbake_yocto_dir / "build"
     layers = []
     
-    # 1. Try bitbake-layers (authoritative but fragile)
+    # 1. Try bitbake-layers (authoritative but fragile), reusing the cached
+    #    output while bblayers.conf is unchanged
     try:
-        # We need a shell that can source. oe-init-build-env is required.
-        rel_yocto = bitbake_yocto_dir.relative_to(workspace_root)
-        cmd = f"source {rel_yocto}/layers/openembedded-core/oe-init-build-env {rel_yocto}/build && bitbake-layers show-layers"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=workspace_root, executable="/bin/bash")
-        
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                parts = line.split()
-                if len(parts) >= 2 and parts[0] != "layer":
-                     if parts[0] in ["NOTE:", "WARNING:", "ERROR:"]:
-                         continue
-                     layers.append(parts[0]) # name
+        cached = get_cached_show_layers(workspace_root, build_dir)
+        
+        if cached is not None:
+            lines = cached.splitlines()
+        else:
+            # We need a shell that can source. oe-init-build-env is required.
+            rel_yocto = bitbake_yocto_dir.relative_to(workspace_root)
+            cmd = f"source {rel_yocto}/layers/openembedded-core/oe-init-build-env {rel_yocto}/build && bitbake-layers show-layers"
+            lines = stream_command(cmd, cwd=workspace_root, executable="/bin/bash")
+        
+        # Parse as the output arrives, keeping the raw lines for the cache
+        captured = []
+        for line in lines:
+            captured.append(line)
+            match = SHOW_LAYERS_ROW_RE.match(line)
+            if match:
+                layers.append(match.group(1)) # name
+        
+        if cached is None:
+            set_cached_show_layers(workspace_root, build_dir, "\n".join(captured) + "\n")
+    except subprocess.CalledProcessError:
+        # Output of a failed run is not trustworthy
+        layers = []
     except Exception:
         pass
     